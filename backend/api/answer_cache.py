@@ -0,0 +1,120 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Cosine similarity above which two questions are taken to ask the same thing
+SIMILARITY_THRESHOLD = 0.95
+MAX_ENTRIES_PER_REPO = 200
+MAX_REPOS = 500
+# Seconds a cached answer is served, even if the repo isn't re-indexed
+ANSWER_TTL = 24 * 60 * 60
+
+
+@dataclass
+class CachedAnswer:
+    # Unit length, so a dot product is the cosine similarity
+    embedding: List[float]
+    model: str
+    content_version: int
+    answer: str
+    expires_at: float
+
+
+def _normalize(embedding: List[float]) -> List[float]:
+    norm = math.sqrt(math.sumprod(embedding, embedding)) or 1.0
+    return [value / norm for value in embedding]
+
+
+class AnswerCache:
+    """Per-repo cache of answers to semantically similar questions.
+
+    Entries are only served for the same model and content version of the repo
+    index, so a re-index that changes the repo invalidates them. Each repo keeps
+    its most recently used MAX_ENTRIES_PER_REPO answers, and the least recently
+    used repos are dropped past MAX_REPOS.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_ENTRIES_PER_REPO,
+        max_repos: int = MAX_REPOS,
+        ttl: float = ANSWER_TTL,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_repos = max_repos
+        self.ttl = ttl
+        self._repos: OrderedDict[str, List[CachedAnswer]] = OrderedDict()
+
+    def get(
+        self, repo_id: str, embedding: List[float], model: str, content_version: int
+    ) -> Optional[str]:
+        entries = self._repos.get(repo_id)
+        if not entries:
+            return None
+
+        now = time.monotonic()
+        # Drop answers for older content or past their TTL while scanning
+        entries[:] = [
+            entry
+            for entry in entries
+            if entry.content_version == content_version and entry.expires_at > now
+        ]
+
+        query = _normalize(embedding)
+        best: Optional[CachedAnswer] = None
+        best_score = self.threshold
+        for entry in entries:
+            if entry.model != model:
+                continue
+            score = math.sumprod(query, entry.embedding)
+            if score >= best_score:
+                best, best_score = entry, score
+
+        if best is None:
+            return None
+
+        # Most recently used last, so eviction takes from the front
+        entries.remove(best)
+        entries.append(best)
+        self._repos.move_to_end(repo_id)
+        return best.answer
+
+    def put(
+        self,
+        repo_id: str,
+        embedding: List[float],
+        model: str,
+        content_version: int,
+        answer: str,
+    ):
+        entries = self._repos.setdefault(repo_id, [])
+        self._repos.move_to_end(repo_id)
+        entries.append(
+            CachedAnswer(
+                embedding=_normalize(embedding),
+                model=model,
+                content_version=content_version,
+                answer=answer,
+                expires_at=time.monotonic() + self.ttl,
+            )
+        )
+        del entries[: -self.max_entries]
+
+        while len(self._repos) > self.max_repos:
+            self._repos.popitem(last=False)
+
+    def invalidate(self, repo_id: str):
+        self._repos.pop(repo_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "repos": len(self._repos),
+            "entries": sum(len(entries) for entries in self._repos.values()),
+        }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,85 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+# Version 1 re-sends the whole answer on every token, version 2 sends deltas
+LEGACY_STREAM_VERSION = 1
+DELTA_STREAM_VERSION = 2
+# First checkpoint after this many characters, then each time the answer doubles,
+# so checkpoints add at most ~2x the answer length to the stream
+CHECKPOINT_MIN_CHARS = 4096
+
+
+def _event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+class ChatStreamEncoder:
+    """Formats an answer stream as server-sent events for the negotiated version.
+
+    Version 1 emits `data: {"content": <answer so far>}` per token, which the
+    original frontend expects. Version 2 emits:
+
+    - `event: delta` with `{"delta": <new text>}` per token
+    - `event: checkpoint` with `{"content", "length"}` at geometric intervals,
+      so a client can resync without the stream growing quadratically
+    - `event: done` with the message id, token usage, timing and whether the
+      answer came from the answer cache
+    """
+
+    def __init__(self, version: int = LEGACY_STREAM_VERSION):
+        self.version = version
+        self.length = 0
+        self._parts: List[str] = []
+        self._next_checkpoint = CHECKPOINT_MIN_CHARS
+        self._started = time.perf_counter()
+        self._first_token: Optional[float] = None
+
+    @property
+    def content(self) -> str:
+        return "".join(self._parts)
+
+    def delta(self, text: str) -> str:
+        if not text:
+            return ""
+        if self._first_token is None:
+            self._first_token = time.perf_counter()
+        self._parts.append(text)
+        self.length += len(text)
+
+        if self.version < DELTA_STREAM_VERSION:
+            return _event({"content": self.content})
+
+        event = _event({"delta": text}, "delta")
+        if self.length >= self._next_checkpoint:
+            event += _event(
+                {"content": self.content, "length": self.length}, "checkpoint"
+            )
+            self._next_checkpoint = self.length * 2
+        return event
+
+    def done(
+        self,
+        message_id: str,
+        usage: Optional[Dict[str, int]] = None,
+        cached: bool = False,
+    ) -> str:
+        if self.version < DELTA_STREAM_VERSION:
+            return ""
+
+        finished = time.perf_counter()
+        first_token = self._first_token or finished
+        return _event(
+            {
+                "message_id": message_id,
+                "length": self.length,
+                "usage": usage or {},
+                "cached": cached,
+                "timing": {
+                    "first_token_ms": round((first_token - self._started) * 1000, 1),
+                    "total_ms": round((finished - self._started) * 1000, 1),
+                },
+            },
+            "done",
+        )
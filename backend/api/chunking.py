@@ -0,0 +1,321 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 100
+# Symbol names kept per chunk in Pinecone metadata
+MAX_SYMBOLS = 20
+
+# Character windows for files without a syntax-aware splitter and for oversized nodes
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    length_function=len,
+)
+
+
+@dataclass
+class Chunk:
+    content: str
+    # 1-based, inclusive
+    start_line: int
+    end_line: int
+    symbols: List[str] = field(default_factory=list)
+
+
+# A top-level node as a [start, end) range of lines
+Node = Tuple[int, int, List[str]]
+
+
+SCRIPT_DECLARATION = re.compile(
+    r"^(?:export\s+(?:default\s+)?)?(?:declare\s+)?(?:async\s+)?"
+    r"(?:function\b|class\b|abstract\s+class\b|const\b|let\b|var\b|"
+    r"interface\b|type\b|enum\b|namespace\b)"
+    r"|^export\b|^import\b|^@|^module\.exports\b|^exports\."
+)
+SCRIPT_SYMBOL = re.compile(
+    r"(?:function\*?|class|const|let|var|interface|type|enum|namespace)"
+    r"\s+([A-Za-z_$][\w$]*)"
+)
+DEFAULT_EXPORT = re.compile(r"^export\s+default\s+([A-Za-z_$][\w$]*)\s*;?\s*$")
+COMMENT_LINE = re.compile(r"^\s*(?://|/\*|\*)")
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+# What a regex literal can follow: nothing, an operator or opening bracket, or a
+# keyword. Anything else (an identifier, number or closing bracket) means division.
+REGEX_PRECEDER = re.compile(
+    r"(?:^\s*|[(,=:\[!&|?;{+\-*%~^]\s*|"
+    r"\b(?:return|typeof|case|in|of|delete|void|throw|new|else|do|yield|await)\s*)$"
+)
+
+
+def _regex_end(line: str, start: int) -> Optional[int]:
+    """Index of the slash closing a regex literal opened at start, if the line has one."""
+    in_class = False
+    i = start + 1
+    while i < len(line):
+        char = line[i]
+        if char == "\\":
+            i += 1
+        elif char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            return i
+        i += 1
+    return None
+
+
+def _brace_depths(lines: List[str]) -> List[int]:
+    """Bracket depth at the start of each line, skipping strings, regexes and comments.
+
+    Quotes are only tracked within a line so an apostrophe in JSX text can't throw
+    off the rest of the file; template literals and block comments span lines.
+    A slash starts a regex literal when what precedes it can't end an operand.
+    The extra last entry is the depth at the end of the file, 0 when balanced.
+    """
+    depths = []
+    depth = 0
+    in_block_comment = False
+    in_template = False
+
+    for line in lines:
+        depths.append(depth)
+        quote: Optional[str] = None
+        i = 0
+        while i < len(line):
+            char = line[i]
+            pair = line[i : i + 2]
+            if in_block_comment:
+                if pair == "*/":
+                    in_block_comment = False
+                    i += 1
+            elif in_template:
+                if char == "\\":
+                    i += 1
+                elif char == "`":
+                    in_template = False
+            elif quote:
+                if char == "\\":
+                    i += 1
+                elif char == quote:
+                    quote = None
+            elif pair == "//":
+                break
+            elif pair == "/*":
+                in_block_comment = True
+                i += 1
+            elif char == "/" and REGEX_PRECEDER.search(line, 0, i):
+                end = _regex_end(line, i)
+                if end is not None:
+                    i = end
+            elif char == "`":
+                in_template = True
+            elif char in "'\"":
+                quote = char
+            elif char in "{([":
+                depth += 1
+            elif char in "})]":
+                depth = max(0, depth - 1)
+            i += 1
+
+    depths.append(depth)
+    return depths
+
+
+def _script_symbol(line: str) -> Optional[str]:
+    match = SCRIPT_SYMBOL.search(line) or DEFAULT_EXPORT.match(line)
+    if match:
+        return match.group(1)
+    if line.startswith("export default"):
+        return "default"
+    return None
+
+
+def _script_nodes(lines: List[str]) -> List[Node]:
+    depths = _brace_depths(lines)
+    if depths[-1] != 0:
+        # Misread syntax; declarations can't be trusted, so split by size alone
+        return [(0, len(lines), [])]
+    starts = []
+    for i, line in enumerate(lines):
+        if depths[i] == 0 and SCRIPT_DECLARATION.match(line):
+            start = i
+            # Keep JSDoc and line comments with the declaration they describe
+            while start > 0 and depths[start - 1] == 0 and COMMENT_LINE.match(
+                lines[start - 1]
+            ):
+                start -= 1
+            if not starts or start > starts[-1]:
+                starts.append(start)
+
+    return _nodes_from_starts(
+        lines, starts, lambda start, end: _script_symbols(lines, start, end, depths)
+    )
+
+
+def _script_symbols(
+    lines: List[str], start: int, end: int, depths: List[int]
+) -> List[str]:
+    symbols = []
+    for i in range(start, end):
+        if depths[i] == 0 and not lines[i].startswith("import"):
+            symbol = _script_symbol(lines[i])
+            if symbol:
+                symbols.append(symbol)
+    return symbols
+
+
+def _css_nodes(lines: List[str]) -> List[Node]:
+    depths = _brace_depths(lines)
+    if depths[-1] != 0:
+        return [(0, len(lines), [])]
+    starts = []
+    previous = ""
+    for i, line in enumerate(lines):
+        # A rule starts at depth 0 once the previous rule or statement has ended,
+        # so multi-line selector lists stay together
+        if (
+            depths[i] == 0
+            and line.strip()
+            and not line.lstrip().startswith("}")
+            and (not previous.strip() or previous.rstrip().endswith(("}", ";")))
+        ):
+            starts.append(i)
+        if line.strip():
+            previous = line
+
+    def selectors(start: int, end: int) -> List[str]:
+        found = []
+        # Lines of a selector list not yet closed by its "{"
+        parts: List[str] = []
+        for i in range(start, end):
+            line = lines[i].strip()
+            if depths[i] != 0 or not line or COMMENT_LINE.match(line):
+                continue
+            head, brace, _ = line.partition("{")
+            parts.append(head.strip())
+            if brace:
+                found.append(" ".join(part for part in parts if part))
+                parts = []
+            elif line.endswith(";"):
+                # A statement such as @import, not a selector
+                parts = []
+        return found
+
+    return _nodes_from_starts(lines, starts, selectors)
+
+
+def _markdown_nodes(lines: List[str]) -> List[Node]:
+    starts = []
+    headings: Dict[int, str] = {}
+    in_fence = False
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = MARKDOWN_HEADING.match(line)
+            if match:
+                starts.append(i)
+                headings[i] = match.group(2)
+
+    return _nodes_from_starts(
+        lines, starts, lambda start, _: [headings[start]] if start in headings else []
+    )
+
+
+def _nodes_from_starts(
+    lines: List[str],
+    starts: List[int],
+    symbols: Callable[[int, int], List[str]],
+) -> List[Node]:
+    if not starts or starts[0] != 0:
+        starts = [0] + starts
+    bounds = starts + [len(lines)]
+    return [
+        (start, end, symbols(start, end))
+        for start, end in zip(bounds, bounds[1:])
+        if end > start
+    ]
+
+
+SPLITTERS: Dict[str, Callable[[List[str]], List[Node]]] = {
+    ".js": _script_nodes,
+    ".jsx": _script_nodes,
+    ".mjs": _script_nodes,
+    ".cjs": _script_nodes,
+    ".ts": _script_nodes,
+    ".tsx": _script_nodes,
+    ".mts": _script_nodes,
+    ".css": _css_nodes,
+    ".scss": _css_nodes,
+    ".md": _markdown_nodes,
+    ".mdx": _markdown_nodes,
+}
+
+
+def _windows(text: str, start_line: int, symbols: List[str]) -> Iterator[Chunk]:
+    cursor = 0
+    for window in text_splitter.split_text(text):
+        offset = text.find(window, cursor)
+        if offset == -1:
+            offset = cursor
+        line = start_line + text.count("\n", 0, offset)
+        yield Chunk(window, line, line + window.count("\n"), symbols[:MAX_SYMBOLS])
+        cursor = offset + 1
+
+
+def split_file(file_path: str, content: str) -> Iterator[Chunk]:
+    """Split a file on top-level declarations, packing small neighbours together.
+
+    Nodes larger than CHUNK_SIZE and files with no syntax-aware splitter fall back
+    to character windows.
+    """
+    splitter = SPLITTERS.get(os.path.splitext(file_path)[1].lower())
+    if splitter is None:
+        yield from _windows(content, 1, [])
+        return
+
+    lines = content.split("\n")
+    # Adjacent nodes being packed into one chunk: (start, end, symbols, size)
+    pending: Optional[Tuple[int, int, List[str], int]] = None
+
+    def flush(start: int, end: int, symbols: List[str]) -> Iterator[Chunk]:
+        while start < end and not lines[start].strip():
+            start += 1
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        if start < end:
+            text = "\n".join(lines[start:end])
+            yield Chunk(text, start + 1, end, symbols[:MAX_SYMBOLS])
+
+    for start, end, symbols in splitter(lines):
+        size = sum(len(line) + 1 for line in lines[start:end])
+
+        if size > CHUNK_SIZE:
+            if pending:
+                yield from flush(*pending[:3])
+                pending = None
+            yield from _windows("\n".join(lines[start:end]), start + 1, symbols)
+            continue
+
+        if pending:
+            pending_start, _, pending_symbols, pending_size = pending
+            if pending_size + size <= CHUNK_SIZE:
+                pending = (
+                    pending_start,
+                    end,
+                    pending_symbols + symbols,
+                    pending_size + size,
+                )
+                continue
+            yield from flush(*pending[:3])
+
+        pending = (start, end, symbols, size)
+
+    if pending:
+        yield from flush(*pending[:3])
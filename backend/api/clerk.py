@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from http.cookies import SimpleCookie
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import httpx
+import jwt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
+# Optional PEM public key from the Clerk dashboard; skips fetching the JWKS entirely
+CLERK_JWT_KEY = os.getenv("CLERK_JWT_KEY")
+CLERK_API_URL = os.getenv("CLERK_API_URL", "https://api.clerk.com/v1")
+
+# Seconds before the JWKS is fetched again in case keys were rotated
+JWKS_REFRESH_INTERVAL = 60 * 60
+# Minimum seconds between refetches triggered by a token signed with an unknown key
+JWKS_MIN_REFETCH_INTERVAL = 60
+# Clock skew tolerated on exp/nbf/iat
+CLOCK_SKEW = 5
+TOKEN_CACHE_SIZE = 10_000
+
+
+def _parse_origins(value: Optional[str]) -> List[str]:
+    return [origin for origin in (value or "").split(",") if origin]
+
+
+# Origins allowed to mint session tokens, the same list CORS allows
+AUTHORIZED_PARTIES = _parse_origins(os.getenv("CORS_ORIGINS"))
+
+
+class AuthError(Exception):
+    pass
+
+
+class JWKSCache:
+    """Clerk's signing keys by kid, refreshed periodically and on unknown kids."""
+
+    def __init__(
+        self,
+        url: str,
+        secret_key: str,
+        refresh_interval: float = JWKS_REFRESH_INTERVAL,
+        min_refetch_interval: float = JWKS_MIN_REFETCH_INTERVAL,
+    ):
+        self.url = url
+        self.secret_key = secret_key
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _refresh(self):
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(
+                self.url, headers={"Authorization": f"Bearer {self.secret_key}"}
+            )
+        response.raise_for_status()
+        self._keys = {
+            jwk["kid"]: jwt.PyJWK(jwk).key for jwk in response.json()["keys"]
+        }
+        self._fetched_at = time.monotonic()
+
+    async def get_key(self, kid: str) -> Any:
+        age = time.monotonic() - self._fetched_at
+        if age > self.refresh_interval or (
+            kid not in self._keys and age > self.min_refetch_interval
+        ):
+            async with self._lock:
+                # Another request may have refreshed while we waited
+                age = time.monotonic() - self._fetched_at
+                if age > self.refresh_interval or (
+                    kid not in self._keys and age > self.min_refetch_interval
+                ):
+                    try:
+                        await self._refresh()
+                    except Exception as e:
+                        # Keep verifying with the keys we have if Clerk is unreachable
+                        if not self._keys:
+                            raise AuthError(f"Could not fetch JWKS: {str(e)}")
+                        logger.warning(f"JWKS refresh failed: {str(e)}")
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise AuthError("Token signed with an unknown key")
+        return key
+
+
+class ClerkTokenVerifier:
+    """Verifies Clerk session JWTs locally, caching each verified token until it expires."""
+
+    def __init__(
+        self,
+        jwks: Optional[JWKSCache] = None,
+        jwt_key: Optional[str] = None,
+        authorized_parties: Optional[List[str]] = None,
+        cache_size: int = TOKEN_CACHE_SIZE,
+    ):
+        if jwks is None and jwt_key is None:
+            raise ValueError("Either a JWKS or a JWT key is required")
+        self.jwks = jwks
+        self.jwt_key = jwt_key
+        self.authorized_parties = authorized_parties or []
+        self.cache_size = cache_size
+        # token -> (user id, exp)
+        self._verified: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+
+    async def verify(self, token: str) -> str:
+        """Return the token's user id, or raise AuthError."""
+        cached = self._verified.get(token)
+        if cached is not None:
+            user_id, expires_at = cached
+            if expires_at > time.time():
+                self._verified.move_to_end(token)
+                return user_id
+            del self._verified[token]
+
+        try:
+            header = jwt.get_unverified_header(token)
+            key = self.jwt_key
+            if key is None:
+                assert self.jwks is not None
+                key = await self.jwks.get_key(header.get("kid", ""))
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                leeway=CLOCK_SKEW,
+                options={"require": ["exp", "iat", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise AuthError(str(e))
+
+        azp = claims.get("azp")
+        if azp and self.authorized_parties and azp not in self.authorized_parties:
+            raise AuthError("Token was issued for an unauthorized party")
+
+        user_id = str(claims["sub"])
+        self._verified[token] = (user_id, float(claims["exp"]))
+        while len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+        return user_id
+
+
+def session_token(headers: Mapping[str, str]) -> Optional[str]:
+    """The bearer token, or Clerk's __session cookie for same-site requests."""
+    authorization = headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:].strip() or None
+
+    cookie_header = headers.get("cookie")
+    if cookie_header:
+        cookie = SimpleCookie()
+        cookie.load(cookie_header)
+        if "__session" in cookie:
+            return cookie["__session"].value or None
+    return None
+
+
+@lru_cache(maxsize=1)
+def get_token_verifier() -> ClerkTokenVerifier:
+    if CLERK_JWT_KEY:
+        return ClerkTokenVerifier(
+            jwt_key=CLERK_JWT_KEY, authorized_parties=AUTHORIZED_PARTIES
+        )
+    if not CLERK_SECRET_KEY:
+        raise Exception("CLERK_SECRET_KEY is not set in environment variables")
+    return ClerkTokenVerifier(
+        jwks=JWKSCache(f"{CLERK_API_URL}/jwks", CLERK_SECRET_KEY),
+        authorized_parties=AUTHORIZED_PARTIES,
+    )
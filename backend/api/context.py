@@ -0,0 +1,305 @@
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+import tiktoken
+
+# Tokens of context (retrieved code, selected snippets and repo info) per prompt.
+# Well under each model's window: past this, answers don't improve but latency and
+# cost keep growing.
+CONTEXT_BUDGETS = {
+    "gpt-4o": 12_000,
+    "claude-3-5-sonnet-20241022": 12_000,
+}
+DEFAULT_CONTEXT_BUDGET = 8_000
+
+# Most of the budget selected snippets may take; they take precedence over the rest
+SNIPPET_SHARE = 0.4
+# Share of what's left for retrieved code; repo info gets the remainder, plus
+# whatever the code doesn't use
+CODE_SHARE = 0.6
+# Tree lines this deep are always kept, so the top-level layout stays visible
+TREE_KEEP_DEPTH = 2
+
+TRUNCATED = "\n... (truncated)"
+# Layout of repo_info, see RepoSnapshot.tree and format_files in api/snapshot.py
+SEPARATOR = "=" * 48
+TREE_ENTRY = re.compile(r"^((?:    |│   )*)(?:├── |└── )(.*)$")
+
+
+@lru_cache(maxsize=8)
+def get_model_encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Close enough to budget models tiktoken doesn't know, e.g. Claude
+        return tiktoken.get_encoding("o200k_base")
+
+
+def context_budget(model: str) -> int:
+    return CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+
+
+@dataclass
+class MergedChunk:
+    file_path: str
+    type: str
+    content: str
+    score: float
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+
+
+@dataclass
+class PackedContext:
+    code: str
+    snippets: str
+    repo_info: str
+    tokens: int
+    # Files the code and snippets come from
+    file_paths: List[str] = field(default_factory=list)
+
+
+class TokenCounter:
+    def __init__(self, model: str):
+        self.encoding = get_model_encoding(model)
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of text within max_tokens, marked as truncated."""
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        keep = max_tokens - self.count(TRUNCATED)
+        if keep <= 0:
+            return ""
+        return self.encoding.decode(tokens[:keep]) + TRUNCATED
+
+
+def merge_chunks(chunks: List[dict]) -> List[MergedChunk]:
+    """Merge overlapping or adjacent chunks of the same file, best scoring first.
+
+    Chunks without line numbers (indexed before syntax-aware chunking) are kept as is.
+    """
+    by_file: Dict[str, List[dict]] = {}
+    merged: List[MergedChunk] = []
+
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        if metadata.get("start_line") is None or metadata.get("end_line") is None:
+            merged.append(
+                MergedChunk(
+                    file_path=metadata["file_path"],
+                    type=metadata["type"],
+                    content=chunk["content"],
+                    score=chunk["score"],
+                )
+            )
+        else:
+            by_file.setdefault(metadata["file_path"], []).append(chunk)
+
+    for file_path, file_chunks in by_file.items():
+        file_chunks.sort(key=lambda chunk: chunk["metadata"]["start_line"])
+        current: Optional[MergedChunk] = None
+        for chunk in file_chunks:
+            metadata = chunk["metadata"]
+            start, end = int(metadata["start_line"]), int(metadata["end_line"])
+            if current is None or start > (current.end_line or 0) + 1:
+                if current is not None:
+                    merged.append(current)
+                current = MergedChunk(
+                    file_path=file_path,
+                    type=metadata["type"],
+                    content=chunk["content"],
+                    score=chunk["score"],
+                    start_line=start,
+                    end_line=end,
+                )
+                continue
+
+            # Append only the lines past what's already there
+            current_end = current.end_line or 0
+            if end > current_end:
+                lines = chunk["content"].split("\n")
+                current.content += "\n" + "\n".join(lines[current_end - start + 1 :])
+                current.end_line = end
+            current.score = max(current.score, chunk["score"])
+        if current is not None:
+            merged.append(current)
+
+    merged.sort(key=lambda chunk: chunk.score, reverse=True)
+    return merged
+
+
+def format_code(chunks: List[MergedChunk]) -> str:
+    # Files in order of their best chunk, chunks in file order
+    by_file: Dict[str, List[MergedChunk]] = {}
+    for chunk in chunks:
+        by_file.setdefault(chunk.file_path, []).append(chunk)
+
+    parts = []
+    for file_path, file_chunks in by_file.items():
+        part = f"\nFile: {file_path}\n"
+        for chunk in sorted(file_chunks, key=lambda chunk: chunk.start_line or 0):
+            if chunk.start_line is not None:
+                part += f"Lines {chunk.start_line}-{chunk.end_line}:\n"
+            part += f"```{chunk.type}\n{chunk.content}\n```\n"
+        parts.append(part)
+    return "\n".join(parts)
+
+
+def pack_code(chunks: List[MergedChunk], budget: int, counter: TokenCounter) -> str:
+    """The best scoring chunks that fit the budget.
+
+    A chunk that doesn't fit is skipped in favour of smaller ones after it, unless
+    nothing fits at all, in which case the best one is truncated.
+    """
+    selected: List[MergedChunk] = []
+    used = 0
+    for chunk in chunks:
+        cost = counter.count(format_code([chunk]))
+        if used + cost <= budget:
+            selected.append(chunk)
+            used += cost
+
+    if not selected and chunks:
+        best = chunks[0]
+        overhead = counter.count(format_code([best])) - counter.count(best.content)
+        content = counter.truncate(best.content, budget - overhead)
+        if content:
+            best.content = content
+            selected.append(best)
+    return format_code(selected)
+
+
+def pack_snippets(
+    selected_context: Optional[dict], budget: int, counter: TokenCounter
+) -> str:
+    if not selected_context:
+        return ""
+
+    parts = []
+    remaining = budget
+    for file_path, snippets in selected_context.items():
+        for snippet in snippets:
+            part = f"\nFile: {file_path}\n```\n{snippet}\n```\n"
+            cost = counter.count(part)
+            if cost > remaining:
+                part = counter.truncate(part, remaining)
+                if part:
+                    parts.append(part)
+                return "".join(parts)
+            parts.append(part)
+            remaining -= cost
+    return "".join(parts)
+
+
+def relevant_tree(tree: str, file_paths: Iterable[str], question: str) -> str:
+    """Trim a directory tree to its top levels, plus the directories leading to the
+    files in context or to entries named in the question, with their contents."""
+    lines = tree.rstrip("\n").split("\n")
+    # The first two lines are the header and the repo root
+    header, entries = lines[:2], lines[2:]
+
+    # (line, depth, path, parent) of every entry
+    parsed = []
+    # Directory name at each depth
+    stack: List[str] = []
+    for line in entries:
+        match = TREE_ENTRY.match(line)
+        if not match:
+            continue
+        # The repo root's own entries are one level in
+        depth = len(match.group(1)) // 4 - 1
+        name = match.group(2)
+        del stack[depth:]
+        parent = "/".join(stack)
+        path = f"{parent}/{name.rstrip('/')}" if parent else name.rstrip("/")
+        if name.endswith("/"):
+            stack.append(name.rstrip("/"))
+        parsed.append((line, depth, path, parent))
+
+    terms = {term for term in re.findall(r"[\w.-]{3,}", question.lower())}
+    targets = list(file_paths) + [
+        path
+        for _, _, path, _ in parsed
+        if path.lower() in terms
+        or (name := path.rsplit("/", 1)[-1].lower()) in terms
+        or name.rsplit(".", 1)[0] in terms
+    ]
+    relevant_dirs: Set[str] = {""}
+    for target in targets:
+        parts = target.split("/")
+        relevant_dirs.update("/".join(parts[:i]) for i in range(len(parts)))
+        relevant_dirs.add(target)
+
+    kept = [
+        line
+        for line, depth, _, parent in parsed
+        if depth < TREE_KEEP_DEPTH or parent in relevant_dirs
+    ]
+    if len(kept) < len(parsed):
+        header[0] = "Directory structure (trimmed to the relevant parts):"
+    return "\n".join(header + kept) + "\n"
+
+
+def pack_repo_info(
+    repo_info: str,
+    budget: int,
+    counter: TokenCounter,
+    file_paths: Iterable[str],
+    question: str,
+) -> str:
+    if budget <= 0 or not repo_info:
+        return ""
+    if counter.count(repo_info) <= budget:
+        return repo_info
+    if not repo_info.startswith("Directory structure:"):
+        # A repo profile, already ordered so truncation drops the least useful parts
+        return counter.truncate(repo_info, budget)
+
+    # repo_info is the tree, then package.json and README.md in format_files layout
+    tree, _, files = repo_info.partition(f"\n{SEPARATOR}\n")
+    files = f"\n{SEPARATOR}\n{files}" if files else ""
+
+    tree = relevant_tree(tree, file_paths, question)
+    tree = counter.truncate(tree, budget // 2 if files else budget)
+    files = counter.truncate(files, budget - counter.count(tree))
+    return tree + files
+
+
+def pack_context(
+    model: str,
+    chunks: List[dict],
+    question: str,
+    selected_context: Optional[dict] = None,
+    repo_info: str = "",
+) -> PackedContext:
+    """Fit retrieved chunks, selected snippets and repo info into the model's budget."""
+    counter = TokenCounter(model)
+    budget = context_budget(model)
+
+    snippets = pack_snippets(selected_context, int(budget * SNIPPET_SHARE), counter)
+    remaining = budget - counter.count(snippets)
+
+    merged = merge_chunks(chunks)
+    code = pack_code(merged, int(remaining * CODE_SHARE), counter)
+    remaining -= counter.count(code)
+
+    file_paths = list(
+        dict.fromkeys(
+            [chunk.file_path for chunk in merged] + list(selected_context or {})
+        )
+    )
+    info = pack_repo_info(repo_info, remaining, counter, file_paths, question)
+
+    return PackedContext(
+        code=code,
+        snippets=snippets,
+        repo_info=info,
+        tokens=budget - remaining + counter.count(info),
+        file_paths=file_paths,
+    )
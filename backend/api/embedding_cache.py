@@ -0,0 +1,125 @@
+import asyncio
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from db.config import SessionLocal
+from db.models import CachedEmbedding
+
+Embedding = List[float]
+
+
+def encode_embedding(embedding: Embedding) -> bytes:
+    return array("f", embedding).tobytes()
+
+
+def decode_embedding(data: bytes) -> Embedding:
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class PostgresEmbeddingStore:
+    async def get_many(self, model: str, hashes: List[str]) -> Dict[str, Embedding]:
+        async with SessionLocal() as db:
+            rows = await db.execute(
+                select(CachedEmbedding.content_hash, CachedEmbedding.embedding).where(
+                    CachedEmbedding.model == model,
+                    CachedEmbedding.content_hash.in_(hashes),
+                )
+            )
+            return {row.content_hash: decode_embedding(row.embedding) for row in rows}
+
+    async def put_many(self, model: str, embeddings: Dict[str, Embedding]):
+        async with SessionLocal() as db:
+            await db.execute(
+                insert(CachedEmbedding)
+                .values(
+                    [
+                        {
+                            "content_hash": h,
+                            "model": model,
+                            "embedding": encode_embedding(embedding),
+                        }
+                        for h, embedding in embeddings.items()
+                    ]
+                )
+                .on_conflict_do_nothing()
+            )
+            await db.commit()
+
+
+class DiskEmbeddingStore:
+    """One file per embedding under <root>/<model>/<hash[:2]>/<hash>."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, model: str, h: str) -> Path:
+        return self.root / model / h[:2] / h
+
+    def _get_many(self, model: str, hashes: List[str]) -> Dict[str, Embedding]:
+        found = {}
+        for h in hashes:
+            try:
+                found[h] = decode_embedding(self._path(model, h).read_bytes())
+            except FileNotFoundError:
+                continue
+        return found
+
+    def _put_many(self, model: str, embeddings: Dict[str, Embedding]):
+        for h, embedding in embeddings.items():
+            path = self._path(model, h)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(encode_embedding(embedding))
+            tmp_path.replace(path)
+
+    async def get_many(self, model: str, hashes: List[str]) -> Dict[str, Embedding]:
+        return await asyncio.to_thread(self._get_many, model, hashes)
+
+    async def put_many(self, model: str, embeddings: Dict[str, Embedding]):
+        await asyncio.to_thread(self._put_many, model, embeddings)
+
+
+class EmbeddingCache:
+    """Looks embeddings up in each store in order; misses are backfilled into earlier stores."""
+
+    def __init__(self, stores: list):
+        self.stores = stores
+
+    async def get_many(self, model: str, hashes: List[str]) -> Dict[str, Embedding]:
+        found: Dict[str, Embedding] = {}
+        missing = list(hashes)
+
+        for i, store in enumerate(self.stores):
+            if not missing:
+                break
+            hits = await store.get_many(model, missing)
+            if hits and i > 0:
+                for earlier in self.stores[:i]:
+                    await earlier.put_many(model, hits)
+            found.update(hits)
+            missing = [h for h in missing if h not in hits]
+
+        return found
+
+    async def put_many(self, model: str, embeddings: Dict[str, Embedding]):
+        if not embeddings:
+            return
+        for store in self.stores:
+            await store.put_many(model, embeddings)
+
+
+def create_embedding_cache() -> EmbeddingCache:
+    stores: list = []
+    # Optional local store in front of Postgres, e.g. on a persistent volume
+    cache_dir: Optional[str] = os.getenv("EMBEDDING_CACHE_DIR")
+    if cache_dir:
+        stores.append(DiskEmbeddingStore(cache_dir))
+    stores.append(PostgresEmbeddingStore())
+    return EmbeddingCache(stores)
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import random
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import openai
+import tiktoken
+from langchain_openai import OpenAIEmbeddings
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+# OpenAI accepts up to 300k tokens and 2048 inputs per embeddings request. Batches are
+# kept well below that so a repo still fans out over a few concurrent requests.
+MAX_BATCH_TOKENS = 50_000
+MAX_BATCH_SIZE = 256
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=1)
+def get_encoding() -> tiktoken.Encoding:
+    # cl100k_base is the tokenizer used by the text-embedding-3 models
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def batch_chunks(
+    chunks: Iterable[dict],
+    max_tokens: int = MAX_BATCH_TOKENS,
+    max_size: int = MAX_BATCH_SIZE,
+) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    batch_tokens = 0
+
+    for chunk in chunks:
+        tokens = count_tokens(chunk["content"])
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_size):
+            yield batch
+            batch = []
+            batch_tokens = 0
+
+        batch.append(chunk)
+        batch_tokens += tokens
+
+    if batch:
+        yield batch
+
+
+async def iterate_in_thread(items: Iterable[T]) -> AsyncIterator[T]:
+    """Step a blocking iterator in a worker thread, one item at a time."""
+    iterator = iter(items)
+    done = object()
+    while (item := await asyncio.to_thread(next, iterator, done)) is not done:
+        yield item
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that grows by one on success and halves when rate limited."""
+
+    def __init__(self, initial: int, maximum: int):
+        self.limit = initial
+        self.maximum = maximum
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1)
+
+    def on_throttle(self):
+        self.limit = max(1, self.limit // 2)
+
+
+def _retry_after(error: openai.APIStatusError) -> Optional[float]:
+    value = error.response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class BatchEmbedder:
+    def __init__(
+        self,
+        embeddings: OpenAIEmbeddings,
+        cache=None,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 16,
+        max_retries: int = 6,
+        backoff_base: float = 0.5,
+    ):
+        self.embeddings = embeddings
+        # Optional store with async get_many/put_many, see api/embedding_cache.py
+        self.cache = cache
+        self.limiter = AdaptiveLimiter(initial_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                vectors = await self.embeddings.aembed_documents(texts)
+                self.limiter.on_success()
+                return vectors
+            except openai.RateLimitError as e:
+                if attempt == self.max_retries:
+                    raise
+                self.limiter.on_throttle()
+                delay = _retry_after(e)
+            except (openai.APIConnectionError, openai.InternalServerError):
+                if attempt == self.max_retries:
+                    raise
+                delay = None
+
+            if delay is None:
+                delay = self.backoff_base * 2**attempt + random.uniform(0, 0.25)
+            await asyncio.sleep(delay)
+
+        raise RuntimeError("unreachable")
+
+    async def _embed_cached(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return await self._embed(texts)
+
+        model = self.embeddings.model
+        hashes = [content_hash(text) for text in texts]
+        found = await self.cache.get_many(model, list(set(hashes)))
+
+        misses = {h: text for h, text in zip(hashes, texts) if h not in found}
+        if misses:
+            vectors = await self._embed(list(misses.values()))
+            embedded = dict(zip(misses.keys(), vectors))
+            await self.cache.put_many(model, embedded)
+            found.update(embedded)
+
+        return [found[h] for h in hashes]
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a few texts directly, with the same retries and cache as batches."""
+        return await self._embed_cached(texts)
+
+    async def embed_batches(
+        self, batches: Iterable[List[dict]]
+    ) -> AsyncIterator[Tuple[List[dict], List[List[float]]]]:
+        """Embed batches concurrently, yielding (batch, vectors) in completion order.
+
+        batches is usually a lazy pipeline that reads, splits and token-counts
+        files, so it's stepped in a worker thread rather than on the event loop.
+        """
+        done: asyncio.Queue = asyncio.Queue()
+        tasks: set = set()
+        pending = 0
+
+        async def run(batch: List[dict]):
+            try:
+                texts = [chunk["content"] for chunk in batch]
+                vectors = await self._embed_cached(texts)
+                done.put_nowait((batch, vectors, None))
+            except Exception as e:
+                done.put_nowait((batch, None, e))
+            finally:
+                await self.limiter.release()
+
+        def result(item):
+            batch, vectors, error = item
+            if error is not None:
+                raise error
+            return batch, vectors
+
+        try:
+            async for batch in iterate_in_thread(batches):
+                await self.limiter.acquire()
+                task = asyncio.create_task(run(batch))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                pending += 1
+
+                while not done.empty():
+                    pending -= 1
+                    yield result(done.get_nowait())
+
+            while pending:
+                pending -= 1
+                yield result(await done.get())
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def create_embeddings_client(**kwargs) -> OpenAIEmbeddings:
+    # Chunks are already token-counted and well under the per-input limit, so skip
+    # langchain's own re-tokenization. Retries are handled by BatchEmbedder.
+    return OpenAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        chunk_size=MAX_BATCH_SIZE,
+        check_embedding_ctx_length=False,
+        max_retries=0,
+        **kwargs,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_embeddings_client() -> OpenAIEmbeddings:
+    """Process-wide client, so every request reuses one pooled HTTP connection."""
+    return create_embeddings_client()
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_ARCHIVE_URL = os.getenv("GITHUB_ARCHIVE_URL", "https://codeload.github.com")
+# Optional; raises the API rate limit from 60 to 5000 requests an hour
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+
+# Conditional responses kept for If-None-Match revalidation
+ETAG_CACHE_SIZE = 1024
+# Longest wait for a rate limit reset before giving up on a request
+MAX_RATE_LIMIT_WAIT = 10.0
+
+
+class GitHubError(Exception):
+    pass
+
+
+class RateLimitedError(GitHubError):
+    def __init__(self, reset_at: float):
+        super().__init__("GitHub rate limit exceeded, try again later")
+        self.reset_at = reset_at
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait per a Retry-After header, given in seconds or as an HTTP-date.
+
+    None when absent or unparseable, so the caller falls back to backoff.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        # HTTP-dates are always GMT
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class GitHubClient:
+    """Shared async client for the GitHub API and archive downloads.
+
+    - One pooled connection per host instead of a new connection per call
+    - GET responses are revalidated with If-None-Match; a 304 is served from
+      cache and doesn't count against the rate limit
+    - X-RateLimit-* headers are tracked so an exhausted limit fails fast (or
+      serves cached data) instead of hammering GitHub until the reset
+    - Connection errors and 5xx responses are retried with backoff
+    """
+
+    def __init__(
+        self,
+        api_url: str = GITHUB_API_URL,
+        archive_url: str = GITHUB_ARCHIVE_URL,
+        token: Optional[str] = GITHUB_TOKEN,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "User-Agent": "reactchat",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        self.api_url = api_url.rstrip("/")
+        self.archive_url = archive_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(10.0, read=60.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            follow_redirects=True,
+            transport=transport,
+        )
+        # url -> (etag, status, body)
+        self._etags: OrderedDict[str, Tuple[str, int, Any]] = OrderedDict()
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: float = 0.0
+
+    def _track_rate_limit(self, response: httpx.Response):
+        remaining = response.headers.get("x-ratelimit-remaining")
+        reset = response.headers.get("x-ratelimit-reset")
+        if remaining is not None:
+            self.rate_limit_remaining = int(remaining)
+        if reset is not None:
+            self.rate_limit_reset = float(reset)
+
+    def _rate_limited(self) -> bool:
+        return self.rate_limit_remaining == 0 and time.time() < self.rate_limit_reset
+
+    async def _wait_for_rate_limit(self):
+        if not self._rate_limited():
+            return
+        wait = self.rate_limit_reset - time.time()
+        if wait > MAX_RATE_LIMIT_WAIT:
+            raise RateLimitedError(self.rate_limit_reset)
+        await asyncio.sleep(wait)
+
+    async def _send(
+        self, request: httpx.Request, stream: bool = False, api: bool = True
+    ) -> httpx.Response:
+        # Archive downloads aren't counted against the API rate limit
+        for attempt in range(self.max_retries + 1):
+            if api:
+                await self._wait_for_rate_limit()
+            delay: Optional[float] = None
+            try:
+                response = await self._client.send(request, stream=stream)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if api:
+                    self._track_rate_limit(response)
+                retry_after = response.headers.get("retry-after")
+                # Primary limits report remaining 0; secondary limits send Retry-After
+                throttled = response.status_code in (403, 429) and (
+                    retry_after is not None or (api and self.rate_limit_remaining == 0)
+                )
+                if not throttled and response.status_code < 500:
+                    return response
+                if attempt == self.max_retries:
+                    if throttled:
+                        await response.aclose()
+                        raise RateLimitedError(self.rate_limit_reset)
+                    return response
+                await response.aclose()
+                delay = retry_after_seconds(retry_after)
+                if delay is not None:
+                    if delay > MAX_RATE_LIMIT_WAIT:
+                        raise RateLimitedError(time.time() + delay)
+
+            if delay is None:
+                delay = self.backoff_base * 2**attempt + random.uniform(0, 0.25)
+            await asyncio.sleep(delay)
+
+        raise RuntimeError("unreachable")
+
+    async def get(self, path: str, accept: Optional[str] = None) -> Tuple[int, Any]:
+        """GET an API path, returning (status, JSON or text body), revalidated by ETag."""
+        url = f"{self.api_url}{path}"
+        cache_key = f"{accept or ''} {url}"
+        cached = self._etags.get(cache_key)
+
+        # Out of requests: cached data beats an error
+        if cached is not None and self._rate_limited():
+            return cached[1], cached[2]
+
+        headers = {"Accept": accept} if accept else {}
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        response = await self._send(
+            self._client.build_request("GET", url, headers=headers)
+        )
+
+        if response.status_code == 304 and cached is not None:
+            self._etags.move_to_end(cache_key)
+            return cached[1], cached[2]
+
+        if "json" in response.headers.get("content-type", ""):
+            body: Any = response.json()
+        else:
+            body = response.text
+
+        etag = response.headers.get("etag")
+        if etag and response.status_code in (200, 404):
+            self._etags[cache_key] = (etag, response.status_code, body)
+            self._etags.move_to_end(cache_key)
+            while len(self._etags) > ETAG_CACHE_SIZE:
+                self._etags.popitem(last=False)
+        return response.status_code, body
+
+    async def get_repo(self, repo_path: str) -> Optional[Dict[str, Any]]:
+        """Repository metadata, or None if it doesn't exist or isn't visible to us."""
+        status, body = await self.get(f"/repos/{repo_path}")
+        if status == 404:
+            return None
+        if status != 200:
+            raise GitHubError(f"GitHub returned {status} for {repo_path}")
+        return body
+
+    async def get_commit_sha(self, repo_path: str, ref: str = "HEAD") -> Optional[str]:
+        status, body = await self.get(
+            f"/repos/{repo_path}/commits/{ref}", accept="application/vnd.github.sha"
+        )
+        if status != 200:
+            return None
+        return str(body).strip()
+
+    @asynccontextmanager
+    async def stream_archive(
+        self, repo_path: str, ref: str
+    ) -> AsyncIterator[httpx.Response]:
+        url = f"{self.archive_url}/{repo_path}/tar.gz/{ref}"
+        response = await self._send(
+            self._client.build_request("GET", url), stream=True, api=False
+        )
+        try:
+            if response.status_code != 200:
+                raise GitHubError("Failed to download repository")
+            yield response
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+@lru_cache(maxsize=1)
+def get_github_client() -> GitHubClient:
+    return GitHubClient()
@@ -0,0 +1,34 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import RepoChunk, RepoIndex
+from db.pinecone import get_index
+
+
+def is_indexed(repo: RepoIndex) -> bool:
+    """Whether the repo can be queried, from Postgres state rather than Pinecone."""
+    return str(repo.indexing_status) == "completed"
+
+
+async def reconcile(db: AsyncSession, repo: RepoIndex) -> bool:
+    """Adopt vectors already in Pinecone for a repo Postgres has never indexed."""
+    if repo.indexing_status not in (None, "not_started"):
+        return False
+
+    # Without chunk rows the lexical half of hybrid search would come up empty,
+    # so such repos are indexed again instead
+    has_chunks = await db.scalar(
+        select(RepoChunk.id).where(RepoChunk.namespace == str(repo.id)).limit(1)
+    )
+    if has_chunks is None:
+        return False
+
+    stats = await asyncio.to_thread(get_index().describe_index_stats)
+    summary = stats.namespaces.get(str(repo.id))
+    if not summary or not summary.vector_count:
+        return False
+
+    setattr(repo, "indexing_status", "completed")
+    await db.commit()
+    return True
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import signal
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+from db.config import SessionLocal
+from db.models import IndexingJob, RepoIndex
+from api.profile import update_profile
+from api.progress import progress_broker, relay_progress
+from api.rag import create_embeddings
+from api.repos import get_repo, release_repo
+from api.snapshot import get_snapshot
+
+logger = logging.getLogger(__name__)
+
+SKIP_FILES = [
+    "yarn.lock",
+    "bun.lockb",
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    ".gitignore",
+    ".env*",
+    "tsconfig.json",
+    "prettier.config.js",
+    "postcss.config.js",
+    "next.config.js",
+    ".eslintrc",
+    "tailwind.config",
+]
+
+MAX_ATTEMPTS = 5
+# Retry delays grow 30s, 60s, 120s, ... up to MAX_BACKOFF seconds
+BACKOFF_BASE = 30
+MAX_BACKOFF = 600
+# A running job whose heartbeat is older than this is assumed dead and reclaimed
+LEASE_SECONDS = 120
+HEARTBEAT_INTERVAL = 30
+# Seconds an idle worker slot waits before polling the queue again
+POLL_INTERVAL = 2.0
+# Seconds a stopping worker lets in-flight jobs finish before handing them back
+DRAIN_TIMEOUT = 25.0
+
+
+class LeaseLostError(Exception):
+    pass
+
+
+async def enqueue_indexing(db: AsyncSession, repo: RepoIndex):
+    """Queue an indexing job for the repo, unless one is already queued or running.
+
+    The caller commits.
+    """
+    await db.execute(
+        insert(IndexingJob)
+        .values(
+            id=uuid.uuid4().hex,
+            repo_id=repo.id,
+            status="queued",
+            attempts=0,
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+async def claim_job() -> Optional[str]:
+    async with SessionLocal() as db:
+        job = (
+            await db.execute(
+                select(IndexingJob)
+                .where(
+                    or_(
+                        and_(
+                            IndexingJob.status == "queued",
+                            IndexingJob.run_after <= func.now(),
+                        ),
+                        and_(
+                            IndexingJob.status == "running",
+                            IndexingJob.heartbeat_at
+                            < func.now() - timedelta(seconds=LEASE_SECONDS),
+                        ),
+                    )
+                )
+                .order_by(IndexingJob.run_after)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+        ).scalar_one_or_none()
+        if not job:
+            return None
+
+        job_id = str(job.id)
+        setattr(job, "status", "running")
+        setattr(job, "attempts", job.attempts + 1)
+        setattr(job, "heartbeat_at", func.now())
+        await db.commit()
+        return job_id
+
+
+async def _touch(job_id: str):
+    async with SessionLocal() as db:
+        await db.execute(
+            update(IndexingJob)
+            .where(IndexingJob.id == job_id)
+            .values(heartbeat_at=func.now())
+        )
+        await db.commit()
+
+
+async def _heartbeat(job_id: str):
+    last_touched = time.monotonic()
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            await _touch(job_id)
+            last_touched = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Heartbeat for indexing job {job_id} failed: {str(e)}")
+            # Give the job up before another worker could reclaim it
+            if time.monotonic() - last_touched >= LEASE_SECONDS - HEARTBEAT_INTERVAL:
+                raise LeaseLostError(f"Lost the lease on indexing job {job_id}")
+
+
+async def _requeue(job_id: str):
+    """Hand a job this worker is stopping on back to the queue, without using an attempt."""
+    async with SessionLocal() as db:
+        await db.execute(
+            update(IndexingJob)
+            .where(IndexingJob.id == job_id, IndexingJob.status == "running")
+            .values(
+                status="queued",
+                attempts=IndexingJob.attempts - 1,
+                run_after=func.now(),
+            )
+        )
+        await db.commit()
+
+
+async def _release_if_unused(db: AsyncSession, repo_id: str):
+    # The repo's last chat may have been deleted while the job ran, see release_repo
+    try:
+        await release_repo(db, repo_id)
+        await db.commit()
+    except Exception as e:
+        logger.warning(f"Releasing {repo_id} failed: {str(e)}")
+        await db.rollback()
+
+
+async def _get_job(db: AsyncSession, job_id: str) -> Optional[IndexingJob]:
+    return (
+        await db.execute(select(IndexingJob).where(IndexingJob.id == job_id))
+    ).scalar_one_or_none()
+
+
+async def run_job(job_id: str):
+    async with SessionLocal() as db:
+        job = await _get_job(db, job_id)
+        if not job:
+            return
+        repo_id = str(job.repo_id)
+
+        try:
+            # Jobs reclaimed after a crash count as attempts too
+            if job.attempts > MAX_ATTEMPTS:
+                raise Exception("Too many attempts")
+
+            repo = await get_repo(db, repo_id)
+            if not repo:
+                # Released since it was queued; the cascade normally removes the job
+                setattr(job, "status", "failed")
+                await db.commit()
+                return
+
+            snapshot = await get_snapshot(str(repo.github_url))
+            files = snapshot.select(exclude_patterns=SKIP_FILES)
+
+            async def index():
+                await create_embeddings(db, repo_id, snapshot, files, job)
+                try:
+                    await update_profile(repo, snapshot)
+                except Exception as e:
+                    # Prompts fall back to repo_info, not worth failing the index over
+                    logger.warning(f"Profile for {repo_id} failed: {str(e)}")
+
+            heartbeat = asyncio.create_task(_heartbeat(job_id))
+            work = asyncio.create_task(index())
+            try:
+                await asyncio.wait(
+                    (heartbeat, work), return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                for task in (heartbeat, work):
+                    task.cancel()
+                await asyncio.gather(heartbeat, work, return_exceptions=True)
+            if not work.done() or work.cancelled():
+                # Only the heartbeat finishes first, by raising LeaseLostError
+                heartbeat.result()
+            work.result()
+
+            setattr(job, "status", "completed")
+            await db.commit()
+            await _release_if_unused(db, repo_id)
+        except LeaseLostError as e:
+            # The job is left running, so it's reclaimed once its lease expires
+            logger.error(str(e))
+            await db.rollback()
+        except asyncio.CancelledError:
+            # Worker shutting down
+            logger.info(f"Handing indexing job {job_id} back to the queue")
+            await db.rollback()
+            await _requeue(job_id)
+            raise
+        except Exception as e:
+            logger.error(f"Indexing job {job_id} failed: {str(e)}")
+            await db.rollback()
+
+            # The repo, and with it the job, may have been released meanwhile
+            job = await _get_job(db, job_id)
+            if not job:
+                return
+
+            setattr(job, "last_error", str(e))
+            if job.attempts >= MAX_ATTEMPTS:
+                setattr(job, "status", "failed")
+                # A failed refresh leaves the previous index queryable
+                await db.execute(
+                    update(RepoIndex)
+                    .where(
+                        RepoIndex.id == repo_id,
+                        RepoIndex.indexing_status != "completed",
+                    )
+                    .values(indexing_status="failed")
+                )
+                progress_broker.publish(repo_id, "failed")
+            else:
+                delay = min(BACKOFF_BASE * 2 ** (job.attempts - 1), MAX_BACKOFF)
+                setattr(job, "status", "queued")
+                setattr(
+                    job,
+                    "run_after",
+                    datetime.now(timezone.utc) + timedelta(seconds=delay),
+                )
+            await db.commit()
+            if job.status == "failed":
+                await _release_if_unused(db, repo_id)
+
+
+async def run_worker(concurrency: int = 2):
+    """Run jobs until SIGTERM/SIGINT, then drain the ones in flight.
+
+    Jobs still running after DRAIN_TIMEOUT are handed back to the queue.
+    """
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    async def slot():
+        while not stopping.is_set():
+            job_id = await claim_job()
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(stopping.wait(), POLL_INTERVAL)
+                except TimeoutError:
+                    pass
+                continue
+            logger.info(f"Running indexing job {job_id}")
+            await run_job(job_id)
+
+    logger.info(f"Indexing worker started with concurrency {concurrency}")
+    # Progress goes to the web processes' SSE streams over Postgres
+    async with relay_progress(listen=False):
+        slots = [asyncio.create_task(slot()) for _ in range(concurrency)]
+        await stopping.wait()
+
+        logger.info("Indexing worker stopping, draining in-flight jobs")
+        _, pending = await asyncio.wait(slots, timeout=DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*slots, return_exceptions=True)
+    logger.info("Indexing worker stopped")
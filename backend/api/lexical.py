@@ -0,0 +1,313 @@
+import asyncio
+import heapq
+import math
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import RepoChunk
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Times a chunk's file path and symbols count towards its terms, so a chunk that
+# defines useAuth outranks one that only calls it
+FIELD_BOOST = 3
+# Repos whose index is kept in memory, least recently used dropped first
+MAX_CACHED_INDEXES = 64
+# Longer questions are about behaviour rather than a named identifier, and go
+# through vector search even if they name one
+MAX_IDENTIFIER_QUERY_WORDS = 12
+# Files whose chunk symbols are headings rather than code definitions
+PROSE_EXTENSIONS = (".md", ".mdx")
+
+WORD = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*|[0-9]+")
+# Parts of camelCase, PascalCase and ACRONYMCase words
+WORD_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+# What a question names explicitly: `quoted` code, camelCase, snake_case and file names
+BACKTICKED = re.compile(r"`([^`\n]+)`")
+IDENTIFIER = re.compile(
+    r"\b(?:[a-z]+[A-Z][A-Za-z0-9]*"
+    r"|[A-Z][a-z0-9]+[A-Z][A-Za-z0-9]*"
+    r"|[A-Za-z0-9]+_[A-Za-z0-9_]+)\b"
+    r"|[\w$.-]+\.(?:tsx?|jsx?|mjs|cjs|css|scss|json|mdx?|html)\b"
+)
+
+# English question words and keywords too common in React code to tell chunks apart
+STOPWORDS = {
+    "a",
+    "an",
+    "and",
+    "are",
+    "as",
+    "at",
+    "be",
+    "by",
+    "can",
+    "do",
+    "does",
+    "for",
+    "from",
+    "how",
+    "i",
+    "if",
+    "in",
+    "is",
+    "it",
+    "me",
+    "of",
+    "on",
+    "or",
+    "the",
+    "this",
+    "that",
+    "to",
+    "use",
+    "used",
+    "what",
+    "when",
+    "where",
+    "which",
+    "why",
+    "with",
+    "you",
+    "const",
+    "let",
+    "var",
+    "return",
+    "import",
+    "export",
+    "default",
+    "function",
+    "else",
+    "true",
+    "false",
+    "null",
+    "undefined",
+    "new",
+    "props",
+    "div",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of text, with identifiers also split into their parts.
+
+    useAuth yields useauth and auth, Navbar.tsx yields navbar and tsx, so questions
+    match both the exact identifier and the words in it.
+    """
+    terms = []
+    for word in WORD.findall(text):
+        lower = word.lower()
+        if len(lower) > 1 and lower not in STOPWORDS:
+            terms.append(lower)
+        parts = WORD_PART.findall(word)
+        if len(parts) > 1:
+            terms.extend(
+                part
+                for part in (part.lower() for part in parts)
+                if len(part) > 1 and part not in STOPWORDS
+            )
+    return terms
+
+
+def file_names(file_path: str) -> Tuple[str, str]:
+    # Navbar.tsx and Navbar for components/Navbar.tsx
+    name = file_path.rsplit("/", 1)[-1]
+    return name, name.split(".", 1)[0]
+
+
+def is_prose(file_path: str) -> bool:
+    return file_path.lower().endswith(PROSE_EXTENSIONS)
+
+
+@dataclass
+class LexicalDoc:
+    id: str
+    file_path: str
+    content: str
+    symbols: List[str] = field(default_factory=list)
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+
+    def terms(self) -> List[str]:
+        names = tokenize(" ".join([self.file_path, *self.symbols]))
+        return tokenize(self.content) + names * FIELD_BOOST
+
+    def to_chunk(self, score: float) -> dict:
+        # Same shape as search_embeddings' chunks, see api/rag.py
+        return {
+            "id": self.id,
+            "content": self.content,
+            "metadata": {
+                "file_path": self.file_path,
+                "type": "code",
+                "symbols": self.symbols,
+                "start_line": self.start_line,
+                "end_line": self.end_line,
+            },
+            "score": score,
+        }
+
+
+class LexicalIndex:
+    """In-memory BM25 index over a repo's chunks, with exact symbol and file lookup."""
+
+    def __init__(self, docs: List[LexicalDoc]):
+        self.docs = docs
+        # term -> [(doc, term frequency)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        # Code symbols and file names, case-sensitive -> docs defining them
+        self.definitions: Dict[str, Set[int]] = {}
+
+        for i, doc in enumerate(docs):
+            counts = Counter(doc.terms())
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((i, frequency))
+            # Markdown headings are prose; they help BM25 rank through terms()
+            # but would make ordinary capitalized words look like identifiers
+            symbols = [] if is_prose(doc.file_path) else doc.symbols
+            for name in [*symbols, *file_names(doc.file_path)]:
+                self.definitions.setdefault(name, set()).add(i)
+        self.average_length = sum(self.lengths) / len(docs) if docs else 1.0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def scores(self, query: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        total = len(self.docs)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, frequency in postings:
+                length = self.lengths[i] / self.average_length
+                scores[i] = scores.get(i, 0.0) + idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * (1 - BM25_B + BM25_B * length)
+                )
+        return scores
+
+    def search(self, query: str, top_k: int) -> List[dict]:
+        ranked = heapq.nlargest(top_k, self.scores(query).items(), key=lambda x: x[1])
+        return [self.docs[i].to_chunk(score) for i, score in ranked]
+
+    def identifiers(self, question: str) -> List[str]:
+        """The identifiers a short question names, if every one is defined in the repo.
+
+        Empty for conceptual questions, or when any named identifier is unknown and
+        only semantic search could find what it refers to.
+        """
+        if len(question.split()) > MAX_IDENTIFIER_QUERY_WORDS:
+            return []
+        named = [
+            word
+            for quoted in BACKTICKED.findall(question)
+            for word in re.findall(r"[\w$.-]+", quoted)
+        ]
+        named += IDENTIFIER.findall(question)
+        # Capitalized words like Navbar only count when the repo defines them; plain
+        # lowercase ones like index are usually just English
+        named += [
+            word
+            for word in WORD.findall(question)
+            if word != word.lower() and word in self.definitions
+        ]
+
+        identifiers = list(
+            dict.fromkeys(name.rsplit("/", 1)[-1].strip(".") for name in named)
+        )
+        if not identifiers or any(
+            name not in self.definitions for name in identifiers
+        ):
+            return []
+        return identifiers
+
+    def lookup(self, identifiers: List[str], question: str, top_k: int) -> List[dict]:
+        """Chunks defining the identifiers first, then the best BM25 matches."""
+        defining = set().union(*(self.definitions[name] for name in identifiers))
+        scores = self.scores(" ".join([question, *identifiers]))
+        ranked = heapq.nsmallest(
+            top_k,
+            defining | set(scores),
+            key=lambda i: (i not in defining, -scores.get(i, 0.0)),
+        )
+        return [self.docs[i].to_chunk(scores.get(i, 0.0)) for i in ranked]
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[List[dict]], top_k: int, k: int = 60
+) -> List[dict]:
+    """Merge ranked chunk lists by summing 1 / (k + rank) of each chunk's ranks.
+
+    Ranks rather than scores are fused, since BM25 and cosine scores aren't
+    comparable. The fused score replaces each chunk's own.
+    """
+    fused: Dict[str, float] = {}
+    chunks: Dict[str, dict] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            fused[chunk["id"]] = fused.get(chunk["id"], 0.0) + 1 / (k + rank)
+            chunks.setdefault(chunk["id"], chunk)
+
+    best = heapq.nlargest(top_k, fused.items(), key=lambda x: x[1])
+    return [{**chunks[id], "score": score} for id, score in best]
+
+
+_indexes: OrderedDict[Tuple[str, int], LexicalIndex] = OrderedDict()
+
+
+async def get_lexical_index(
+    db: AsyncSession, namespace: str, content_version: int
+) -> LexicalIndex:
+    """The repo's lexical index, built from repo_chunks once per content version.
+
+    Repos indexed before lexical search get an empty index until their next re-index.
+    """
+    key = (namespace, content_version)
+    if key in _indexes:
+        _indexes.move_to_end(key)
+        return _indexes[key]
+
+    rows = await db.execute(
+        select(
+            RepoChunk.id,
+            RepoChunk.file_path,
+            RepoChunk.content,
+            RepoChunk.symbols,
+            RepoChunk.start_line,
+            RepoChunk.end_line,
+        ).where(RepoChunk.namespace == namespace)
+    )
+    docs = [
+        LexicalDoc(
+            id=row.id,
+            file_path=row.file_path,
+            content=row.content,
+            symbols=list(row.symbols or []),
+            start_line=row.start_line,
+            end_line=row.end_line,
+        )
+        for row in rows
+    ]
+    # Tokenizing a few hundred chunks takes tens of milliseconds
+    index = await asyncio.to_thread(LexicalIndex, docs)
+
+    # Older versions of this repo won't be asked for again
+    for cached in [cached for cached in _indexes if cached[0] == namespace]:
+        del _indexes[cached]
+    _indexes[key] = index
+    while len(_indexes) > MAX_CACHED_INDEXES:
+        _indexes.popitem(last=False)
+    return index
+
+
+def invalidate_lexical_index(namespace: str):
+    for key in [key for key in _indexes if key[0] == namespace]:
+        del _indexes[key]
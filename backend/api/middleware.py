@@ -1,11 +1,19 @@
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Optional
 import os
 import httpx
 from dotenv import load_dotenv
 from clerk_backend_api import Clerk
 from clerk_backend_api.jwks_helpers import AuthenticateRequestOptions
+from api.clerk import (
+    AUTHORIZED_PARTIES,
+    ClerkTokenVerifier,
+    get_token_verifier,
+    session_token,
+)
 
 load_dotenv()
 
@@ -13,57 +21,85 @@ CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
 if not CLERK_SECRET_KEY:
     raise Exception("CLERK_SECRET_KEY is not set in environment variables")
 
+# "jwks" verifies session tokens locally against Clerk's cached signing keys;
+# "sdk" authenticates every request through the Clerk SDK
+CLERK_AUTH_MODE = os.getenv("CLERK_AUTH_MODE") or "jwks"
+if CLERK_AUTH_MODE not in ("jwks", "sdk"):
+    raise Exception(f"Unknown CLERK_AUTH_MODE: {CLERK_AUTH_MODE}")
 
-class ClerkAuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method == "OPTIONS":
-            return await call_next(request)
+# Public paths to skip
+PUBLIC_PATHS = ["/auth/webhook"]
 
-        # Public paths to skip
-        public_paths = ["/auth/webhook"]
-        if request.url.path in public_paths:
-            return await call_next(request)
+sdk = Clerk(bearer_auth=CLERK_SECRET_KEY)
+
+
+def authenticate_with_sdk(scope: Scope) -> str:
+    # The SDK only looks at headers, so the body is left unread
+    request = Request(scope)
+    httpx_request = httpx.Request(
+        method=request.method,
+        url=str(request.url),
+        headers=dict(request.headers),
+    )
+
+    # Authenticate the request using Clerk's authenticate_request method.
+    # https://github.com/clerk/clerk-sdk-python/blob/main/README.md
+    request_state = sdk.authenticate_request(
+        httpx_request,
+        AuthenticateRequestOptions(
+            authorized_parties=AUTHORIZED_PARTIES,
+        ),
+    )
+
+    if not request_state.is_signed_in:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    payload = request_state.payload
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="User payload is missing or invalid")
+    return payload.get("sub")
+
+
+class ClerkAuthMiddleware:
+    """Pure ASGI auth: reads only the headers and passes receive/send through
+    untouched, so request bodies aren't buffered and responses stream directly.
+
+    The user ID is stored in the scope's state, read by routes as request.state.user_id.
+    """
+
+    def __init__(self, app: ASGIApp, verifier: Optional[ClerkTokenVerifier] = None):
+        self.app = app
+        self.verifier = verifier
+
+    async def authenticate(self, scope: Scope) -> str:
+        if CLERK_AUTH_MODE == "sdk" and self.verifier is None:
+            return authenticate_with_sdk(scope)
+
+        token = session_token(Headers(scope=scope))
+        if not token:
+            raise HTTPException(status_code=401, detail="Unauthorized")
+        verifier = self.verifier or get_token_verifier()
+        return await verifier.verify(token)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "lifespan":
+            await self.app(scope, receive, send)
+            return
+
+        if scope.get("method") == "OPTIONS" or scope["path"] in PUBLIC_PATHS:
+            await self.app(scope, receive, send)
+            return
 
         try:
-            body = await request.body()
-            # Convert Starlette Request to an httpx.Request as required by the Clerk SDK
-            httpx_request = httpx.Request(
-                method=request.method,
-                url=str(request.url),
-                headers=dict(request.headers),
-                content=body,
-            )
-
-            sdk = Clerk(bearer_auth=CLERK_SECRET_KEY)
-            cors_origins = os.getenv("CORS_ORIGINS")
-            if cors_origins:
-                cors_origins = cors_origins.split(",")
-            else:
-                cors_origins = []
-
-            # Authenticate the request using Clerk's authenticate_request method.
-            # https://github.com/clerk/clerk-sdk-python/blob/main/README.md
-            request_state = sdk.authenticate_request(
-                httpx_request,
-                AuthenticateRequestOptions(
-                    authorized_parties=cors_origins,
-                ),
-            )
-
-            if not request_state.is_signed_in:
-                raise HTTPException(status_code=401, detail="Unauthorized")
-
-            payload = request_state.payload
-            if payload is None or payload.get("sub") is None:
-                raise HTTPException(
-                    status_code=401, detail="User payload is missing or invalid"
-                )
-
-            # Save the user ID to the request state for later usage in route handlers.
-            request.state.user_id = payload.get("sub")
+            user_id = await self.authenticate(scope)
         except Exception as e:
-            return JSONResponse(status_code=401, content={"error": str(e)})
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1008})
+            else:
+                response = JSONResponse(status_code=401, content={"error": str(e)})
+                await response(scope, receive, send)
+            return
 
-        # Continue processing the request if authentication was successful.
-        response = await call_next(request)
-        return response
+        # Save the user ID to the request state for later usage in route handlers.
+        scope.setdefault("state", {})["user_id"] = user_id
+        await self.app(scope, receive, send)
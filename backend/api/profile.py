@@ -0,0 +1,305 @@
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from langchain_openai import ChatOpenAI
+from db.models import RepoIndex
+from api.snapshot import RepoSnapshot, matches
+
+logger = logging.getLogger(__name__)
+
+# Writes the one-off overview of each repo version, so a small model is plenty
+PROFILE_MODEL = os.getenv("PROFILE_MODEL") or "gpt-4o-mini"
+
+MAX_TREE_DEPTH = 4
+# Entries listed per directory before the rest are summarized as a count
+MAX_DIR_ENTRIES = 15
+MAX_SCRIPTS = 15
+MAX_DEPENDENCIES = 60
+# Characters of README sent to the model for the overview
+MAX_README_CHARS = 8000
+
+# Files that say nothing about the app's structure
+TREE_PRUNE = [
+    "LICENSE*",
+    "license*",
+    "*.lock",
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    ".gitignore",
+    ".prettierrc*",
+    ".eslintrc*",
+    ".editorconfig",
+    ".env*",
+    ".github/*",
+    ".vscode/*",
+    ".husky/*",
+]
+
+# Detected by any of their dependencies or config files
+FRAMEWORKS = [
+    ("Next.js", ["next"], ["next.config.*"]),
+    ("Remix", ["@remix-run/react"], ["remix.config.*"]),
+    ("Gatsby", ["gatsby"], ["gatsby-config.*"]),
+    ("Astro", ["astro"], ["astro.config.*"]),
+    ("Expo", ["expo"], []),
+    ("React Native", ["react-native"], []),
+    ("Create React App", ["react-scripts"], []),
+    ("Vite", ["vite"], ["vite.config.*"]),
+]
+
+LIBRARIES = {
+    "state": [
+        "redux",
+        "@reduxjs/toolkit",
+        "zustand",
+        "jotai",
+        "recoil",
+        "mobx",
+        "xstate",
+    ],
+    "data fetching": [
+        "@tanstack/react-query",
+        "react-query",
+        "swr",
+        "@apollo/client",
+    ],
+    "routing": [
+        "react-router",
+        "react-router-dom",
+        "@tanstack/react-router",
+        "wouter",
+    ],
+    "styling": [
+        "tailwindcss",
+        "styled-components",
+        "@emotion/react",
+        "sass",
+        "@mui/material",
+        "@chakra-ui/react",
+    ],
+    "testing": [
+        "jest",
+        "vitest",
+        "@testing-library/react",
+        "cypress",
+        "@playwright/test",
+    ],
+}
+
+LOCKFILES = [
+    ("pnpm", "pnpm-lock.yaml"),
+    ("yarn", "yarn.lock"),
+    ("bun", "bun.lockb"),
+    ("npm", "package-lock.json"),
+]
+
+
+def _load_package(snapshot: RepoSnapshot, path: str) -> Dict[str, Any]:
+    file = snapshot.file(path)
+    if not file:
+        return {}
+    try:
+        package = json.loads(snapshot.read(file))
+    except ValueError:
+        return {}
+    return package if isinstance(package, dict) else {}
+
+
+def pruned_tree(snapshot: RepoSnapshot) -> str:
+    """The file tree to MAX_TREE_DEPTH, with large directories summarized."""
+    root: Dict[str, dict] = {}
+    for file in snapshot.files:
+        if matches(file.path, TREE_PRUNE):
+            continue
+        node = root
+        for part in file.path.split("/"):
+            node = node.setdefault(part, {})
+
+    def count_files(node: Dict[str, dict]) -> int:
+        return sum(count_files(child) if child else 1 for child in node.values())
+
+    repo_name = "-".join(snapshot.github_url.rstrip("/").split("/")[-2:])
+    lines = ["Directory structure:", f"└── {repo_name}/"]
+
+    def walk(node: Dict[str, dict], prefix: str, depth: int):
+        # Directories first, then files, both alphabetical
+        entries = sorted(node.items(), key=lambda item: (not item[1], item[0]))
+        hidden = entries[MAX_DIR_ENTRIES:]
+        entries = entries[:MAX_DIR_ENTRIES]
+        for i, (name, children) in enumerate(entries):
+            last = i == len(entries) - 1 and not hidden
+            connector = "└── " if last else "├── "
+            if children and depth >= MAX_TREE_DEPTH:
+                count = count_files(children)
+                summary = f"{name}/ ({count} file{'' if count == 1 else 's'})"
+                lines.append(f"{prefix}{connector}{summary}")
+                continue
+            lines.append(f"{prefix}{connector}{name}{'/' if children else ''}")
+            if children:
+                walk(children, prefix + ("    " if last else "│   "), depth + 1)
+        if hidden:
+            lines.append(f"{prefix}└── ... {len(hidden)} more")
+
+    walk(root, "    ", 1)
+    return "\n".join(lines) + "\n"
+
+
+def compute_profile(snapshot: RepoSnapshot) -> Dict[str, Any]:
+    """Everything about the repo the prompts need, derived from its files."""
+    package_paths = [
+        file.path
+        for file in snapshot.files
+        if file.path.rsplit("/", 1)[-1] == "package.json"
+    ]
+    # The root package, or the shallowest one in repos without one
+    package_paths.sort(key=lambda path: (path.count("/"), path))
+    packages = {path: _load_package(snapshot, path) for path in package_paths}
+    main = packages[package_paths[0]] if package_paths else {}
+
+    # Detection looks at every package, so monorepos are recognized by their apps
+    all_dependencies: set = set()
+    for package in packages.values():
+        for key in ("dependencies", "devDependencies", "peerDependencies"):
+            if isinstance(package.get(key), dict):
+                all_dependencies.update(package[key])
+    names = {file.path.rsplit("/", 1)[-1] for file in snapshot.files}
+
+    frameworks = [
+        name
+        for name, dependencies, configs in FRAMEWORKS
+        if any(dependency in all_dependencies for dependency in dependencies)
+        or any(fnmatch.filter(names, pattern) for pattern in configs)
+    ]
+    libraries = {
+        category: found
+        for category, candidates in LIBRARIES.items()
+        if (found := [name for name in candidates if name in all_dependencies])
+    }
+    typescript = "typescript" in all_dependencies or "tsconfig.json" in names
+    package_manager = next(
+        (manager for manager, lockfile in LOCKFILES if lockfile in names), None
+    )
+
+    dependencies = main.get("dependencies") or {}
+    dev_dependencies = main.get("devDependencies") or {}
+    scripts = main.get("scripts") or {}
+    return {
+        "name": main.get("name"),
+        "description": main.get("description"),
+        "frameworks": frameworks or ["React"],
+        "language": "TypeScript" if typescript else "JavaScript",
+        "package_manager": package_manager,
+        "scripts": dict(list(scripts.items())[:MAX_SCRIPTS]),
+        "dependencies": dict(list(dependencies.items())[:MAX_DEPENDENCIES]),
+        "dev_dependencies": list(dev_dependencies)[:MAX_DEPENDENCIES],
+        "libraries": libraries,
+        "workspaces": [path.rsplit("/", 1)[0] for path in package_paths[1:]],
+        "tree": pruned_tree(snapshot),
+        "overview": None,
+    }
+
+
+def format_profile(profile: Dict[str, Any]) -> str:
+    """The profile as prompt text, most important first so truncation cuts the tree."""
+    lines = []
+    if profile.get("overview"):
+        lines.append(f"Overview: {profile['overview']}")
+    if profile.get("description"):
+        lines.append(f"Description: {profile['description']}")
+
+    stack = f"{', '.join(profile['frameworks'])} ({profile['language']})"
+    if profile.get("package_manager"):
+        stack += f", {profile['package_manager']}"
+    lines.append(f"Stack: {stack}")
+
+    if profile.get("libraries"):
+        lines.append(
+            "Libraries: "
+            + "; ".join(
+                f"{category}: {', '.join(names)}"
+                for category, names in profile["libraries"].items()
+            )
+        )
+    if profile.get("scripts"):
+        lines.append("Scripts:")
+        lines.extend(
+            f"  {name}: {command}" for name, command in profile["scripts"].items()
+        )
+    if profile.get("dependencies"):
+        lines.append(
+            "Dependencies: "
+            + ", ".join(
+                f"{name}@{version}"
+                for name, version in profile["dependencies"].items()
+            )
+        )
+    if profile.get("dev_dependencies"):
+        lines.append(f"Dev dependencies: {', '.join(profile['dev_dependencies'])}")
+    if profile.get("workspaces"):
+        lines.append(f"Workspaces: {', '.join(profile['workspaces'])}")
+
+    return "\n".join(lines) + "\n\n" + profile["tree"]
+
+
+async def generate_overview(profile: Dict[str, Any], readme: str) -> Optional[str]:
+    """A short LLM-written overview of the repo, or None if the model call fails."""
+    chat_model = ChatOpenAI(model=PROFILE_MODEL, temperature=0)
+    messages = [
+        {
+            "role": "system",
+            "content": """
+            You summarize React codebases for a developer assistant. In at most five
+            sentences, say what the app does, how it is built and how the code is
+            organized. Be concrete and don't speculate beyond the information given.
+            """,
+        },
+        {
+            "role": "user",
+            "content": f"""{format_profile(profile)}
+            README.md:
+            {readme[:MAX_README_CHARS] or "None"}
+            """,
+        },
+    ]
+    try:
+        response = await chat_model.ainvoke(messages)
+        return str(response.content).strip() or None
+    except Exception as e:
+        logger.warning(f"Repo overview generation failed: {str(e)}")
+        return None
+
+
+async def update_profile(repo: RepoIndex, snapshot: RepoSnapshot) -> bool:
+    """Store the profile of the snapshot's commit, unless the repo already has it.
+
+    The caller commits.
+    """
+    # Computed once per commit; only a failed overview is retried
+    if (
+        repo.profile_commit == snapshot.commit_sha
+        and repo.profile
+        and repo.profile.get("overview")
+    ):
+        return False
+
+    profile = await asyncio.to_thread(compute_profile, snapshot)
+    readme_file = snapshot.file("README.md") or next(
+        iter(snapshot.select(include_patterns=["README.md"])), None
+    )
+    readme = await asyncio.to_thread(snapshot.read, readme_file) if readme_file else ""
+    profile["overview"] = await generate_overview(profile, readme)
+
+    setattr(repo, "profile", profile)
+    setattr(repo, "profile_commit", snapshot.commit_sha)
+    return True
+
+
+def repo_context(repo: RepoIndex) -> str:
+    """What prompts get about the repo: its profile, or repo_info until it has one."""
+    if repo.profile:
+        return format_profile(dict(repo.profile))
+    return str(repo.repo_info or "")
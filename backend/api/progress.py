@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+import asyncpg
+from db.config import DATABASE_URL, asyncpg_dsn
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which no further events are published for a topic
+TERMINAL_STATUSES = ("completed", "failed")
+# Seconds a finished topic is kept so late or reconnecting clients still get its result
+FINISHED_TOPIC_TTL = 60.0
+# Postgres channel progress is relayed on between processes
+PROGRESS_CHANNEL = "indexing_progress"
+# Seconds between liveness checks of the LISTEN connection, and before reconnecting
+RELAY_PING_INTERVAL = 30.0
+RELAY_RECONNECT_DELAY = 5.0
+# Seconds a stopping relay waits for pending events to be sent
+RELAY_FLUSH_TIMEOUT = 5.0
+
+
+@dataclass
+class ProgressEvent:
+    id: int
+    status: str
+    progress: float
+
+
+class _Topic:
+    def __init__(self):
+        self.latest: Optional[ProgressEvent] = None
+        self.changed = asyncio.Event()
+
+
+class ProgressBroker:
+    """Pub/sub of indexing progress, keyed by repo id.
+
+    Progress is a state rather than a log, so each topic only keeps its latest
+    event. Event ids are millisecond timestamps, so a client reconnecting with
+    Last-Event-ID (even to a restarted process) only gets newer state.
+    Subscribers are local; events published in other processes arrive through
+    a ProgressRelay.
+    """
+
+    def __init__(self):
+        self._topics: Dict[str, _Topic] = {}
+        # Forwards published events to other processes, see relay_progress
+        self.relay: Optional["ProgressRelay"] = None
+
+    def publish(self, key: str, status: str, progress: float = 0):
+        topic = self._topics.get(key)
+        previous_id = topic.latest.id if topic and topic.latest else 0
+        event_id = max(previous_id + 1, int(time.time() * 1000))
+        event = ProgressEvent(id=event_id, status=status, progress=progress)
+        self._deliver(key, event)
+        if self.relay is not None:
+            self.relay.send(key, event)
+
+    def receive(self, key: str, event: ProgressEvent):
+        """Deliver an event published by another process (or relayed back to this one)."""
+        topic = self._topics.get(key)
+        # Nobody here is following this repo
+        if topic is None:
+            return
+        if topic.latest is not None and topic.latest.id >= event.id:
+            return
+        self._deliver(key, event)
+
+    def _deliver(self, key: str, event: ProgressEvent):
+        topic = self._topics.setdefault(key, _Topic())
+        topic.latest = event
+
+        # Wake current subscribers; later ones wait on a fresh event
+        topic.changed.set()
+        topic.changed = asyncio.Event()
+
+        if event.status in TERMINAL_STATUSES:
+            asyncio.get_running_loop().call_later(
+                FINISHED_TOPIC_TTL, self._expire, key, topic
+            )
+
+    def _expire(self, key: str, topic: _Topic):
+        if self._topics.get(key) is topic and (
+            topic.latest is None or topic.latest.status in TERMINAL_STATUSES
+        ):
+            del self._topics[key]
+
+    def latest(self, key: str) -> Optional[ProgressEvent]:
+        topic = self._topics.get(key)
+        return topic.latest if topic else None
+
+    async def subscribe(
+        self, key: str, last_event_id: int = 0, timeout: float = 15.0
+    ) -> AsyncIterator[Optional[ProgressEvent]]:
+        """Yield events newer than last_event_id, or None after `timeout` idle seconds."""
+        topic = self._topics.setdefault(key, _Topic())
+        try:
+            while True:
+                latest = topic.latest
+                if latest and latest.id > last_event_id:
+                    last_event_id = latest.id
+                    yield latest
+                    continue
+
+                try:
+                    await asyncio.wait_for(topic.changed.wait(), timeout)
+                except TimeoutError:
+                    yield None
+        finally:
+            # Don't keep topics around that nobody ever published to
+            if topic.latest is None and self._topics.get(key) is topic:
+                del self._topics[key]
+
+
+class ProgressRelay:
+    """Carries broker events between processes over Postgres LISTEN/NOTIFY.
+
+    Indexing runs in the worker process (worker.py) while SSE clients are
+    connected to the web processes, so published events are sent with NOTIFY
+    and every listening process feeds them into its own broker. Like the broker,
+    only the latest unsent event per repo is kept.
+    """
+
+    def __init__(self, broker: ProgressBroker, dsn: str):
+        self.broker = broker
+        self.dsn = dsn
+        self._pending: Dict[str, ProgressEvent] = {}
+        self._wake = asyncio.Event()
+        self._sent = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, listen: bool = True):
+        self._tasks.append(asyncio.create_task(self._send_loop()))
+        if listen:
+            self._tasks.append(asyncio.create_task(self._listen_loop()))
+
+    async def stop(self):
+        if self._pending:
+            try:
+                await asyncio.wait_for(self._sent.wait(), RELAY_FLUSH_TIMEOUT)
+            except TimeoutError:
+                logger.warning(f"Dropped {len(self._pending)} unsent progress events")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def send(self, key: str, event: ProgressEvent):
+        self._pending[key] = event
+        self._sent.clear()
+        self._wake.set()
+
+    async def _send_loop(self):
+        connection: Optional[asyncpg.Connection] = None
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+                pending, self._pending = self._pending, {}
+                try:
+                    if connection is None or connection.is_closed():
+                        connection = await asyncpg.connect(self.dsn)
+                    for key, event in pending.items():
+                        payload = json.dumps({"key": key, **asdict(event)})
+                        await connection.execute(
+                            "SELECT pg_notify($1, $2)", PROGRESS_CHANNEL, payload
+                        )
+                except Exception as e:
+                    logger.warning(f"Relaying indexing progress failed: {str(e)}")
+                    # Retry, unless newer events for the same repos arrived meanwhile
+                    for key, event in pending.items():
+                        self._pending.setdefault(key, event)
+                    if connection is not None:
+                        connection.terminate()
+                        connection = None
+                    await asyncio.sleep(RELAY_RECONNECT_DELAY)
+                    self._wake.set()
+                    continue
+                if not self._pending:
+                    self._sent.set()
+        finally:
+            if connection is not None:
+                connection.terminate()
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        try:
+            data = json.loads(payload)
+            key = data.pop("key")
+            event = ProgressEvent(**data)
+        except (ValueError, TypeError, KeyError):
+            logger.warning(f"Ignoring malformed progress notification: {payload}")
+            return
+        self.broker.receive(key, event)
+
+    async def _listen_loop(self):
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                try:
+                    await connection.add_listener(PROGRESS_CHANNEL, self._on_notify)
+                    # Events sent while reconnecting are missed; SSE streams fall
+                    # back to Postgres state when they hear nothing for a while
+                    while True:
+                        await asyncio.sleep(RELAY_PING_INTERVAL)
+                        await connection.execute("SELECT 1")
+                finally:
+                    connection.terminate()
+            except Exception as e:
+                logger.warning(f"Listening for indexing progress failed: {str(e)}")
+            await asyncio.sleep(RELAY_RECONNECT_DELAY)
+
+
+progress_broker = ProgressBroker()
+
+
+@asynccontextmanager
+async def relay_progress(listen: bool = True) -> AsyncIterator[ProgressRelay]:
+    """Relay progress_broker events to and, if listen, from other processes."""
+    relay = ProgressRelay(progress_broker, asyncpg_dsn(str(DATABASE_URL)))
+    relay.start(listen)
+    progress_broker.relay = relay
+    try:
+        yield relay
+    finally:
+        progress_broker.relay = None
+        await relay.stop()
@@ -0,0 +1,119 @@
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from api.embeddings import BatchEmbedder, content_hash, get_embeddings_client
+from api.embedding_cache import DiskEmbeddingStore
+
+QUERY_CACHE_SIZE = 2048
+# Seconds a question embedding is kept in memory
+QUERY_CACHE_TTL = 60 * 60
+
+
+def normalize_query(text: str) -> str:
+    # Questions differing only in case or whitespace share an embedding
+    return " ".join(text.split()).casefold()
+
+
+@dataclass
+class QueryCacheMetrics:
+    hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+    miss_seconds: float = 0.0
+    shared_hit_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        lookups = self.hits + self.shared_hits + self.misses
+        average_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        average_shared_hit = (
+            self.shared_hit_seconds / self.shared_hits if self.shared_hits else 0.0
+        )
+        # Estimated from the average embedding round trip this process has seen
+        saved = self.hits * average_miss + self.shared_hits * max(
+            average_miss - average_shared_hit, 0.0
+        )
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "average_miss_ms": average_miss * 1000,
+            "latency_saved_ms": saved * 1000,
+        }
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU/TTL cache of question embeddings, keyed by normalized text.
+
+    An optional shared store (e.g. a DiskEmbeddingStore on a volume every worker
+    mounts) is checked on a local miss, so processes warm each other's caches.
+    """
+
+    def __init__(
+        self,
+        embedder: BatchEmbedder,
+        store: Optional[DiskEmbeddingStore] = None,
+        max_entries: int = QUERY_CACHE_SIZE,
+        ttl: float = QUERY_CACHE_TTL,
+    ):
+        self.embedder = embedder
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.metrics = QueryCacheMetrics()
+        # key -> (embedding, monotonic expiry)
+        self._entries: OrderedDict[str, Tuple[List[float], float]] = OrderedDict()
+
+    def _remember(self, key: str, embedding: List[float]):
+        self._entries[key] = (embedding, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def embed(self, text: str) -> List[float]:
+        normalized = normalize_query(text)
+        key = content_hash(normalized)
+        model = self.embedder.embeddings.model
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            embedding, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.metrics.hits += 1
+                return embedding
+            del self._entries[key]
+
+        started = time.perf_counter()
+        if self.store is not None:
+            found = await self.store.get_many(model, [key])
+            if key in found:
+                self.metrics.shared_hits += 1
+                self.metrics.shared_hit_seconds += time.perf_counter() - started
+                self._remember(key, found[key])
+                return found[key]
+
+        # The key is normalized, but the question is embedded as asked so
+        # identifiers keep their casing
+        [embedding] = await self.embedder.embed([text])
+        self.metrics.misses += 1
+        self.metrics.miss_seconds += time.perf_counter() - started
+
+        self._remember(key, embedding)
+        if self.store is not None:
+            await self.store.put_many(model, {key: embedding})
+        return embedding
+
+    def stats(self) -> Dict[str, float]:
+        return {"entries": len(self._entries), **self.metrics.as_dict()}
+
+
+@lru_cache(maxsize=1)
+def get_query_cache() -> QueryEmbeddingCache:
+    cache_dir = os.getenv("QUERY_EMBEDDING_CACHE_DIR")
+    store = DiskEmbeddingStore(cache_dir) if cache_dir else None
+    return QueryEmbeddingCache(BatchEmbedder(get_embeddings_client()), store)
@@ -1,51 +1,127 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from db.models import Chat
-from langchain_openai import OpenAIEmbeddings
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import IndexingJob, RepoChunk, RepoFile, RepoIndex
+from api.embeddings import BatchEmbedder, batch_chunks, get_embeddings_client
+from api.chunking import split_file
+from api.snapshot import RepoSnapshot, SnapshotFile
+from api.embedding_cache import create_embedding_cache
+from api.progress import progress_broker
+from api.lexical import LexicalIndex, reciprocal_rank_fusion
+from api.index_state import is_indexed
 from db.pinecone import get_index
+from pinecone.exceptions import NotFoundException
 import asyncio
+import hashlib
+import time
 from typing import Dict, Any, cast
 
+# 3072-dim vectors plus chunk text are ~60KB each as JSON; Pinecone caps requests at 2MB
+UPSERT_BATCH_SIZE = 20
+# Embedded batches allowed to wait for upsert
+PIPELINE_DEPTH = 2
+# Minimum seconds between indexed_chunks commits
+PROGRESS_INTERVAL = 1.0
+# Pinecone accepts at most 1000 ids per delete
+DELETE_BATCH_SIZE = 1000
+# Chunks retrieved per question, and candidates from each of vector and lexical
+# search. Exact identifier matches come from the lexical side, so this stays low.
+SEARCH_TOP_K = 5
 
-def create_chunks(content: str):
-    files = content.split("File:")[1:]
-    chunks_with_metadata = []
 
-    for file_content in files:
-        file_lines = file_content.split("\n")
-        file_path = file_lines[0].strip()
-        actual_content = "\n".join(file_lines[2:])
+class ProgressWriter:
+    """Publishes every progress update, but commits indexed_chunks at most once per interval.
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000,
-            chunk_overlap=100,
-            length_function=len,
+    Batches finish out of order, so indexed_chunks is the length of the contiguous
+    prefix of upserted chunks; a retry can safely skip that many chunks.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        repo: RepoIndex,
+        repo_id: str,
+        total: int,
+        start: int = 0,
+        interval: float = PROGRESS_INTERVAL,
+        status: str = "in_progress",
+    ):
+        self.db = db
+        self.repo = repo
+        self.repo_id = repo_id
+        self.status = status
+        self.total = total
+        self.interval = interval
+        self.indexed = start
+        self.watermark = start
+        self._done: Set[int] = set()
+        self._last_commit = time.monotonic()
+
+    async def advance(self, positions: List[int]):
+        self.indexed += len(positions)
+        self._done.update(positions)
+        while self.watermark in self._done:
+            self._done.remove(self.watermark)
+            self.watermark += 1
+
+        setattr(self.repo, "indexed_chunks", self.watermark)
+        progress_broker.publish(
+            self.repo_id, self.status, self.indexed / self.total * 100
         )
-        text_chunks = text_splitter.split_text(actual_content)
-        chunks = [
-            {
-                "content": chunk,
+
+        now = time.monotonic()
+        if now - self._last_commit >= self.interval:
+            await self.db.commit()
+            self._last_commit = now
+
+
+def vector_id(file_path: str, chunk_index: int) -> str:
+    # Stable per file and chunk so unchanged files keep their ids across re-indexes
+    path_hash = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:16]
+    return f"{path_hash}#{chunk_index}"
+
+
+def iter_chunks(files: Iterable[Tuple[str, str]]) -> Iterator[dict]:
+    """Lazily split (path, content) pairs into chunks, one file in memory at a time.
+
+    Blocking: reading and splitting happen as the iterator is advanced, so async
+    callers consume it from a worker thread (see count_chunks and embed_batches).
+    """
+    for file_path, content in files:
+        for i, chunk in enumerate(split_file(file_path, content)):
+            yield {
+                "id": vector_id(file_path, i),
+                "content": chunk.content,
                 "metadata": {
                     "file_path": file_path,
                     "type": "code",
+                    "symbols": chunk.symbols,
+                    "start_line": chunk.start_line,
+                    "end_line": chunk.end_line,
                 },
             }
-            for chunk in text_chunks
-        ]
-        chunks_with_metadata.extend(chunks)
 
-    return chunks_with_metadata
+
+def count_chunks(files: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+    # Blocking, run with asyncio.to_thread
+    chunk_counts: Dict[str, int] = {}
+    for chunk in iter_chunks(files):
+        file_path = chunk["metadata"]["file_path"]
+        chunk_counts[file_path] = chunk_counts.get(file_path, 0) + 1
+    return chunk_counts
 
 
-async def search_embeddings(question_embedding: List[float]) -> List[dict]:
+async def search_embeddings(
+    question_embedding: List[float], namespace: str, top_k: int = SEARCH_TOP_K
+) -> List[dict]:
     index = get_index()
 
     query = await asyncio.to_thread(
         index.query,
         vector=question_embedding,
-        top_k=5,
+        namespace=namespace,
+        top_k=top_k,
         include_metadata=True,
     )
 
@@ -55,10 +131,15 @@ async def search_embeddings(question_embedding: List[float]) -> List[dict]:
     chunks = []
     for match in query_response["matches"]:
         chunk = {
+            "id": match["id"],
             "content": match["metadata"]["content"],
             "metadata": {
                 "file_path": match["metadata"]["file_path"],
                 "type": match["metadata"]["type"],
+                # Missing on vectors indexed before syntax-aware chunking
+                "symbols": match["metadata"].get("symbols", []),
+                "start_line": match["metadata"].get("start_line"),
+                "end_line": match["metadata"].get("end_line"),
             },
             "score": float(match["score"]),
         }
@@ -66,96 +147,264 @@ async def search_embeddings(question_embedding: List[float]) -> List[dict]:
     return chunks
 
 
-def format_context(chunks: List[dict], question: str) -> str:
-    sorted_chunks = sorted(chunks, key=lambda x: x["score"], reverse=True)
-    chunks_by_file = {}
+async def hybrid_search(
+    question: str,
+    question_embedding: List[float],
+    namespace: str,
+    lexical: LexicalIndex,
+    top_k: int = SEARCH_TOP_K,
+) -> List[dict]:
+    """Vector and lexical search side by side, fused by reciprocal rank."""
+    vector_chunks, lexical_chunks = await asyncio.gather(
+        search_embeddings(question_embedding, namespace, top_k),
+        asyncio.to_thread(lexical.search, question, top_k),
+    )
+    return reciprocal_rank_fusion([vector_chunks, lexical_chunks], top_k)
 
-    for chunk in sorted_chunks:
-        file_path = chunk["metadata"]["file_path"]
-        if file_path not in chunks_by_file:
-            chunks_by_file[file_path] = []
-        chunks_by_file[file_path].append(chunk)
 
-    context_parts = []
-    total_length = 0
-    max_length = 5000
+def files_fingerprint(files: Iterable[SnapshotFile]) -> str:
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(f"{file.path}:{file.sha}\n".encode("utf-8"))
+    return digest.hexdigest()
 
-    for file_path, file_chunks in chunks_by_file.items():
-        file_context = f"\nFile: {file_path}\n"
-        for chunk in file_chunks:
-            chunk_text = f"```{chunk['metadata']['type']}\n{chunk['content']}\n```\n"
-            if total_length + len(chunk_text) > max_length:
-                break
-            file_context += chunk_text
-            total_length += len(chunk_text)
 
-        if total_length > max_length:
-            break
+async def create_embeddings(
+    db: AsyncSession,
+    repo_id: str,
+    snapshot: RepoSnapshot,
+    files: List[SnapshotFile],
+    job: Optional[IndexingJob] = None,
+) -> bool:
+    """Index the repo, re-embedding only files whose content changed since the last run.
 
-        context_parts.append(file_context)
+    Failures propagate to the caller, which decides whether to retry. A retry of the
+    same job over the same files resumes after the chunks already upserted.
+    """
+    repo = (
+        await db.execute(select(RepoIndex).where(RepoIndex.id == repo_id))
+    ).scalar_one_or_none()
+    if not repo:
+        return False
 
-    return "\n".join(context_parts)
+    github_url = str(repo.github_url)
+    namespace = repo_id
+    # A refresh of an indexed repo leaves it queryable; its vectors are replaced
+    # in place and stale ones only dropped at the end
+    refreshing = is_indexed(repo)
 
+    current_paths = {file.path for file in files}
+    # {file_path: (content_hash, chunk_count)} from the previous run
+    indexed_files = {
+        row.path: (row.content_hash, row.chunk_count)
+        for row in await db.execute(
+            select(RepoFile.path, RepoFile.content_hash, RepoFile.chunk_count).where(
+                RepoFile.namespace == namespace
+            )
+        )
+    }
 
-async def create_embeddings(db: Session, chat_id: str, content: str):
-    try:
-        chat = db.query(Chat).filter(Chat.id == chat_id).first()
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
+    # Files indexed before lexical search have vectors but no repo_chunks rows;
+    # re-embedding them is cheap since their embeddings are cached
+    lexical_paths = set(
+        (
+            await db.execute(
+                select(RepoChunk.file_path)
+                .where(RepoChunk.namespace == namespace)
+                .distinct()
+            )
+        ).scalars()
+    )
+    changed_files = [
+        file
+        for file in files
+        if indexed_files.get(file.path, (None, 0))[0] != file.sha
+        or (indexed_files[file.path][1] and file.path not in lexical_paths)
+    ]
+    removed_files = [
+        file_path for file_path in indexed_files if file_path not in current_paths
+    ]
 
-        chunks = create_chunks(content)
-        setattr(chat, "total_chunks", len(chunks))
-        setattr(chat, "indexed_chunks", 0)
-        db.commit()
+    # Chunk order is deterministic for the same files, so a retry can pick up
+    # where the previous attempt's committed progress left off
+    fingerprint = files_fingerprint(changed_files)
+    resume_from = 0
+    if job is not None:
+        if job.fingerprint == fingerprint:
+            resume_from = repo.indexed_chunks or 0
+        else:
+            setattr(job, "fingerprint", fingerprint)
 
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-large",
-        )
+    index = get_index()
+    if not indexed_files and not resume_from:
+        # First index for this repo, clear vectors that may predate stable ids
+        try:
+            await asyncio.to_thread(index.delete, delete_all=True, namespace=namespace)
+        except NotFoundException:
+            pass
+        await db.execute(delete(RepoChunk).where(RepoChunk.namespace == namespace))
+
+    def read_changed_files() -> Iterator[Tuple[str, str]]:
+        for file in changed_files:
+            yield file.path, snapshot.read(file)
+
+    def remaining_chunks() -> Iterator[dict]:
+        for position, chunk in enumerate(iter_chunks(read_changed_files())):
+            if position >= resume_from:
+                chunk["position"] = position
+                yield chunk
 
-        batch_size = 20
-        index = get_index()
+    # Counting pass so progress has a total; chunks are re-split lazily below
+    chunk_counts = await asyncio.to_thread(count_chunks, read_changed_files())
+    total_chunks = sum(chunk_counts.values())
+    setattr(repo, "total_chunks", total_chunks)
+    setattr(repo, "indexed_chunks", resume_from)
+    await db.commit()
+
+    embedder = BatchEmbedder(get_embeddings_client(), create_embedding_cache())
+    progress = ProgressWriter(
+        db,
+        repo,
+        repo_id,
+        total_chunks,
+        start=resume_from,
+        status="refreshing" if refreshing else "in_progress",
+    )
+    # Bounded so embedding can run at most PIPELINE_DEPTH batches ahead of Pinecone
+    upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_DEPTH)
 
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i : i + batch_size]
-            batch_contents = [chunk["content"] for chunk in batch]
+    async def embed():
+        # The chunk pipeline is advanced in a worker thread by embed_batches
+        async for batch, batch_embeddings in embedder.embed_batches(
+            batch_chunks(remaining_chunks())
+        ):
+            vectors = [
+                {
+                    "id": chunk["id"],
+                    "values": embedding,
+                    "metadata": {
+                        "content": chunk["content"],
+                        "file_path": chunk["metadata"]["file_path"],
+                        "type": chunk["metadata"]["type"],
+                        "symbols": chunk["metadata"]["symbols"],
+                        "start_line": chunk["metadata"]["start_line"],
+                        "end_line": chunk["metadata"]["end_line"],
+                        "github_url": github_url,
+                    },
+                }
+                for chunk, embedding in zip(batch, batch_embeddings)
+            ]
+            await upsert_queue.put(([chunk["position"] for chunk in batch], vectors))
+        await upsert_queue.put(None)
 
-            try:
-                batch_embeddings = await asyncio.gather(
-                    *[embeddings.aembed_query(content) for content in batch_contents]
+    async def upsert():
+        while (item := await upsert_queue.get()) is not None:
+            positions, vectors = item
+            # Upsert off the event loop, split to stay under Pinecone's request size limit
+            await asyncio.to_thread(
+                index.upsert,
+                vectors=vectors,
+                namespace=namespace,
+                batch_size=UPSERT_BATCH_SIZE,
+                show_progress=False,
+            )
+            # Committed with the progress, so a resumed run has every skipped chunk
+            rows = insert(RepoChunk).values(
+                [
+                    {
+                        "namespace": namespace,
+                        "id": vector["id"],
+                        "file_path": vector["metadata"]["file_path"],
+                        "content": vector["metadata"]["content"],
+                        "symbols": vector["metadata"]["symbols"],
+                        "start_line": vector["metadata"]["start_line"],
+                        "end_line": vector["metadata"]["end_line"],
+                    }
+                    for vector in vectors
+                ]
+            )
+            await db.execute(
+                rows.on_conflict_do_update(
+                    index_elements=[RepoChunk.namespace, RepoChunk.id],
+                    set_={
+                        "file_path": rows.excluded.file_path,
+                        "content": rows.excluded.content,
+                        "symbols": rows.excluded.symbols,
+                        "start_line": rows.excluded.start_line,
+                        "end_line": rows.excluded.end_line,
+                    },
                 )
+            )
+            await progress.advance(positions)
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(embed())
+            tg.create_task(upsert())
+    except ExceptionGroup as eg:
+        raise eg.exceptions[0]
+
+    # Drop vectors of removed files and of chunks past a changed file's new length
+    stale_ids = [
+        vector_id(file_path, i)
+        for file_path in removed_files
+        for i in range(indexed_files[file_path][1])
+    ]
+    for file in changed_files:
+        stale_ids.extend(
+            vector_id(file.path, i)
+            for i in range(
+                chunk_counts.get(file.path, 0),
+                indexed_files.get(file.path, (None, 0))[1],
+            )
+        )
+    for i in range(0, len(stale_ids), DELETE_BATCH_SIZE):
+        await asyncio.to_thread(
+            index.delete,
+            ids=stale_ids[i : i + DELETE_BATCH_SIZE],
+            namespace=namespace,
+        )
+        await db.execute(
+            delete(RepoChunk).where(
+                RepoChunk.namespace == namespace,
+                RepoChunk.id.in_(stale_ids[i : i + DELETE_BATCH_SIZE]),
+            )
+        )
+
+    if removed_files:
+        await db.execute(
+            delete(RepoFile).where(
+                RepoFile.namespace == namespace, RepoFile.path.in_(removed_files)
+            )
+        )
+    if changed_files:
+        file_rows = insert(RepoFile).values(
+            [
+                {
+                    "namespace": namespace,
+                    "path": file.path,
+                    "content_hash": file.sha,
+                    "chunk_count": chunk_counts.get(file.path, 0),
+                }
+                for file in changed_files
+            ]
+        )
+        await db.execute(
+            file_rows.on_conflict_do_update(
+                index_elements=[RepoFile.namespace, RepoFile.path],
+                set_={
+                    "content_hash": file_rows.excluded.content_hash,
+                    "chunk_count": file_rows.excluded.chunk_count,
+                },
+            )
+        )
+
+    if changed_files or removed_files:
+        # Answers cached against the previous content no longer apply
+        setattr(repo, "content_version", repo.content_version + 1)
+    setattr(repo, "indexing_status", "completed")
+    setattr(repo, "indexed_chunks", total_chunks)
+    await db.commit()
+    progress_broker.publish(repo_id, "completed", 100)
 
-                # Prepare vectors for Pinecone upsert
-                vectors = []
-                for j, embedding in enumerate(batch_embeddings):
-                    chunk = batch[j]
-                    vectors.append(
-                        {
-                            "id": f"{chat.github_url}_{i+j}",
-                            "values": embedding,
-                            "metadata": {
-                                "content": chunk["content"],
-                                "file_path": chunk["metadata"]["file_path"],
-                                "type": chunk["metadata"]["type"],
-                                "github_url": chat.github_url,
-                            },
-                        }
-                    )
-
-                # Upsert vectors to Pinecone
-                index.upsert(vectors=vectors)
-
-                setattr(chat, "indexed_chunks", min(i + batch_size, len(chunks)))
-                db.commit()
-            except Exception as chunk_error:
-                raise
-
-        setattr(chat, "indexing_status", "completed")
-        db.commit()
-
-        return True
-    except Exception as e:
-        chat = db.query(Chat).filter(Chat.id == chat_id).first()
-        if chat:
-            setattr(chat, "indexing_status", "failed")
-            db.commit()
-        raise HTTPException(status_code=500, detail=str(e))
+    return True
@@ -0,0 +1,127 @@
+import asyncio
+from typing import Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import Chat, IndexingJob, RepoChunk, RepoFile, RepoIndex
+from db.pinecone import get_index, get_namespace
+from pinecone.exceptions import NotFoundException
+from api.answer_cache import answer_cache
+from api.lexical import invalidate_lexical_index
+
+# A concurrent release can delete the row between the insert and locking it
+CREATE_REPO_ATTEMPTS = 3
+
+
+async def get_repo(
+    db: AsyncSession, repo_id: str, for_update: bool = False
+) -> RepoIndex | None:
+    query = select(RepoIndex).where(RepoIndex.id == repo_id)
+    if for_update:
+        query = query.with_for_update()
+    return (await db.execute(query)).scalars().first()
+
+
+async def get_chat(db: AsyncSession, chat_id: str, user_id: str) -> Chat:
+    chat = (
+        await db.execute(
+            select(Chat).where(Chat.id == chat_id, Chat.user_id == user_id)
+        )
+    ).scalar_one_or_none()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return chat
+
+
+async def get_chat_repo(
+    db: AsyncSession, chat_id: str, user_id: str
+) -> Tuple[Chat, RepoIndex]:
+    row = (
+        await db.execute(
+            select(Chat, RepoIndex)
+            .join(RepoIndex, Chat.repo_id == RepoIndex.id)
+            .where(Chat.id == chat_id, Chat.user_id == user_id)
+        )
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return row[0], row[1]
+
+
+async def get_or_create_repo(
+    db: AsyncSession, github_url: str, repo_info: str
+) -> RepoIndex:
+    """Return the repo's shared index, creating it if this is its first chat.
+
+    The row is locked until the caller commits, so it can't be released between
+    here and the new chat referencing it.
+    """
+    repo_id = get_namespace(github_url)
+    for _ in range(CREATE_REPO_ATTEMPTS):
+        await db.execute(
+            insert(RepoIndex)
+            .values(
+                id=repo_id,
+                github_url=github_url,
+                repo_info=repo_info,
+                indexing_status="not_started",
+                total_chunks=0,
+                indexed_chunks=0,
+            )
+            .on_conflict_do_nothing()
+        )
+        repo = await get_repo(db, repo_id, for_update=True)
+        if repo is not None:
+            return repo
+    raise HTTPException(
+        status_code=409, detail="Repository is being removed, please try again"
+    )
+
+
+async def has_active_job(db: AsyncSession, repo_id: str) -> bool:
+    job_id = await db.scalar(
+        select(IndexingJob.id)
+        .where(
+            IndexingJob.repo_id == repo_id,
+            IndexingJob.status.in_(("queued", "running")),
+        )
+        .limit(1)
+    )
+    return job_id is not None
+
+
+async def release_repo(db: AsyncSession, repo_id: str) -> bool:
+    """Drop the repo's vectors and index state once no chat references it.
+
+    Chats are the references, so the count can't drift from the rows that hold it.
+    While an indexing job is queued or running the release is deferred; the
+    worker releases the repo when the job ends. Returns whether it was released.
+
+    The caller commits, in the same transaction as removing the last reference,
+    so a failed Pinecone delete leaves both the chat and the repo in place.
+    """
+    repo = await get_repo(db, repo_id, for_update=True)
+    if not repo:
+        return False
+    referenced = (
+        await db.execute(select(Chat.id).where(Chat.repo_id == repo_id).limit(1))
+    ).first()
+    if referenced or await has_active_job(db, repo_id):
+        return False
+
+    await db.execute(delete(RepoFile).where(RepoFile.namespace == repo_id))
+    await db.execute(delete(RepoChunk).where(RepoChunk.namespace == repo_id))
+    await db.delete(repo)
+    await db.flush()
+
+    # Last, so anything failing before it rolls the whole release back
+    try:
+        await asyncio.to_thread(get_index().delete, delete_all=True, namespace=repo_id)
+    except NotFoundException:
+        # Namespace was never created (indexing never upserted anything)
+        pass
+    answer_cache.invalidate(repo_id)
+    invalidate_lexical_index(repo_id)
+    return True
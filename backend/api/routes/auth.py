@@ -3,9 +3,11 @@ from dotenv import load_dotenv
 from svix.webhooks import Webhook, WebhookVerificationError
 import os
 import json
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.config import get_db
-from db.models import User
+from db.models import Chat, User
+from api.repos import release_repo
 
 load_dotenv()
 
@@ -17,7 +19,7 @@ if not CLERK_WEBHOOK_SECRET:
 
 
 @router.post("/auth/webhook")
-async def handle_auth_webhook(request: Request, db: Session = Depends(get_db)):
+async def handle_auth_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     body = await request.body()
 
     headers = request.headers
@@ -57,11 +59,20 @@ async def handle_auth_webhook(request: Request, db: Session = Depends(get_db)):
 
         db_user = User(id=user_id, email=email, name=name)
         db.add(db_user)
-        db.commit()
+        await db.commit()
 
     if event_type == "user.deleted":
         user_id = event_data["id"]
-        db.query(User).filter(User.id == user_id).delete()
-        db.commit()
+        repo_ids = (
+            await db.execute(
+                select(Chat.repo_id).where(Chat.user_id == user_id).distinct()
+            )
+        ).scalars().all()
+        # Chats cascade with the user; release the repos only they referenced
+        await db.execute(delete(User).where(User.id == user_id))
+        for repo_id in repo_ids:
+            await release_repo(db, repo_id)
+        # Together, so a failed release leaves the user for Clerk's retry
+        await db.commit()
 
     return {"message": "Webhook processed successfully"}
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.config import get_db
 from db.models import Chat, ChatMessage
-import uuid
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-import json
-from typing import AsyncGenerator, Dict, Any, cast, List
-from api.rag import format_context, search_embeddings
-from db.pinecone import get_index
 import asyncio
+import uuid
+from langchain_openai import ChatOpenAI
+from typing import AsyncGenerator
+from api.rag import SEARCH_TOP_K, hybrid_search
+from api.lexical import get_lexical_index
+from api.context import pack_context
+from api.profile import repo_context
+from api.index_state import is_indexed
+from api.repos import get_chat, get_chat_repo, release_repo
+from api.answer_cache import answer_cache
+from api.query_cache import get_query_cache
+from api.chat_stream import LEGACY_STREAM_VERSION, ChatStreamEncoder
+from api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
 
 # from langchain_anthropic import ChatAnthropic
 
@@ -21,12 +29,31 @@ class ChatMessageRequest(BaseModel):
     message: str
     model: str
     selected_context: dict | None
+    # 2 streams deltas instead of the full answer so far, see api/chat_stream.py
+    stream_version: int = LEGACY_STREAM_VERSION
 
 
 @router.post("/chat/recents")
-async def get_recents(request: Request, db: Session = Depends(get_db)):
+async def get_recents(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """The user's chats, newest first. Pass next_cursor back as cursor for the next page."""
     user_id = request.state.user_id
-    chats = db.query(Chat).filter(Chat.user_id == user_id).all()
+    query = (
+        select(Chat.id, Chat.github_url, Chat.created_at, Chat.is_bookmarked)
+        .where(Chat.user_id == user_id)
+        .order_by(Chat.created_at.desc(), Chat.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(
+            tuple_(Chat.created_at, Chat.id) < tuple_(*decode_cursor(cursor))
+        )
+
+    chats, next_cursor = paginate((await db.execute(query)).all(), limit)
     return {
         "chats": [
             {
@@ -36,16 +63,17 @@ async def get_recents(request: Request, db: Session = Depends(get_db)):
                 "is_bookmarked": chat.is_bookmarked,
             }
             for chat in chats
-        ]
+        ],
+        "next_cursor": next_cursor,
     }
 
 
 @router.get("/chat/{chat_id}/validate")
-async def validate_chat(request: Request, chat_id: str, db: Session = Depends(get_db)):
+async def validate_chat(
+    request: Request, chat_id: str, db: AsyncSession = Depends(get_db)
+):
     user_id = request.state.user_id
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
+    chat = await get_chat(db, chat_id, user_id)
     if str(chat.user_id) != str(user_id):
         raise HTTPException(status_code=403, detail="Forbidden")
 
@@ -59,33 +87,32 @@ async def send_chat_message(
     request: Request,
     message_request: ChatMessageRequest,
     chat_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     user_id = request.state.user_id
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-
-    # Check if vectors exist in Pinecone
-    index = get_index()
-    existing_vectors = await asyncio.to_thread(
-        index.query,
-        vector=[0.0] * 3072,
-        filter={"github_url": str(chat.github_url)},
-        top_k=1,
-    )
-    existing_vectors = cast(Dict[str, Any], existing_vectors)
+    _, repo = await get_chat_repo(db, chat_id, user_id)
 
-    if not existing_vectors["matches"]:
+    if not is_indexed(repo):
         raise HTTPException(status_code=400, detail="Chat repository not indexed")
+    namespace = str(repo.id)
+    content_version = int(repo.content_version)
+    encoder = ChatStreamEncoder(message_request.stream_version)
+
+    lexical = await get_lexical_index(db, namespace, content_version)
+    # Questions naming identifiers the repo defines, e.g. "what does useAuth do?",
+    # are answered from exact matches without embedding the question
+    identifiers = lexical.identifiers(message_request.message)
+    question_embedding = (
+        None
+        if identifiers
+        else await get_query_cache().embed(message_request.message)
+    )
 
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-    question_embedding = await embeddings.aembed_query(message_request.message)
+    # Answers to selected snippets depend on the snippet, so only plain questions are
+    # cached. The cache is keyed by embedding, so identifier questions skip it.
+    cacheable = not message_request.selected_context
 
     try:
-        relevant_chunks = await search_embeddings(question_embedding)
-        context = format_context(relevant_chunks, message_request.message)
-
         user_message = ChatMessage(
             id=str(uuid.uuid4()),
             chat_id=chat_id,
@@ -93,7 +120,53 @@ async def send_chat_message(
             role="user",
         )
         db.add(user_message)
-        db.commit()
+        await db.commit()
+
+        cached_answer = (
+            answer_cache.get(
+                namespace, question_embedding, message_request.model, content_version
+            )
+            if cacheable and question_embedding is not None
+            else None
+        )
+        if cached_answer is not None:
+
+            async def replay_cached_answer() -> AsyncGenerator[str, None]:
+                yield encoder.delta(cached_answer)
+
+                assistant_message = ChatMessage(
+                    id=str(uuid.uuid4()),
+                    chat_id=chat_id,
+                    message=cached_answer,
+                    role="assistant",
+                )
+                db.add(assistant_message)
+                await db.commit()
+
+                if done := encoder.done(str(assistant_message.id), cached=True):
+                    yield done
+
+            return StreamingResponse(
+                replay_cached_answer(), media_type="text/event-stream"
+            )
+
+        if question_embedding is None:
+            relevant_chunks = lexical.lookup(
+                identifiers, message_request.message, SEARCH_TOP_K
+            )
+        else:
+            relevant_chunks = await hybrid_search(
+                message_request.message, question_embedding, namespace, lexical
+            )
+        # Tokenizing repo_info takes a few milliseconds, keep it off the event loop
+        context = await asyncio.to_thread(
+            pack_context,
+            message_request.model,
+            relevant_chunks,
+            message_request.message,
+            message_request.selected_context,
+            repo_context(repo),
+        )
 
         system_prompt = """
         You are an expert React developer helping other developers understand open source React codebases. 
@@ -131,19 +204,22 @@ async def send_chat_message(
         #     )
         # else:
         chat_model = ChatOpenAI(
-            model=message_request.model, temperature=0, streaming=True
+            model=message_request.model,
+            temperature=0,
+            streaming=True,
+            stream_usage=True,
         )
 
         messages = [
             {"role": "system", "content": system_prompt},
             {
                 "role": "user",
-                "content": f"""Available code context from the codebase: {context}
-                User-selected code snippet(s): {message_request.selected_context if message_request.selected_context else "None"}
+                "content": f"""Available code context from the codebase: {context.code}
+                User-selected code snippet(s): {context.snippets or "None"}
 
                 User's question: {message_request.message}
 
-                This is extra information about the codebase which contains the filetree, package.json, and README.md: {chat.repo_info}
+                This is extra information about the codebase, such as its overview, stack, dependencies and filetree: {context.repo_info}
 
                 Please provide an answer based on the available context. If it's insufficient for a 
                 complete answer, say something like "Please be more specific with your query".
@@ -154,11 +230,17 @@ async def send_chat_message(
         ]
 
         async def stream_response_content() -> AsyncGenerator[str, None]:
-            assistant_message_content = ""
+            usage = {}
             async for chunk in chat_model.astream(messages):
-                content = chunk.content
-                assistant_message_content += str(content)
-                yield f"data: {json.dumps({'content': assistant_message_content})}\n\n"
+                if event := encoder.delta(str(chunk.content)):
+                    yield event
+                if chunk.usage_metadata:
+                    usage = {
+                        "input_tokens": chunk.usage_metadata["input_tokens"],
+                        "output_tokens": chunk.usage_metadata["output_tokens"],
+                        "total_tokens": chunk.usage_metadata["total_tokens"],
+                    }
+            assistant_message_content = encoder.content
 
             assistant_message = ChatMessage(
                 id=str(uuid.uuid4()),
@@ -167,7 +249,19 @@ async def send_chat_message(
                 role="assistant",
             )
             db.add(assistant_message)
-            db.commit()
+            await db.commit()
+
+            if cacheable and question_embedding is not None:
+                answer_cache.put(
+                    namespace,
+                    question_embedding,
+                    message_request.model,
+                    content_version,
+                    assistant_message_content,
+                )
+
+            if done := encoder.done(str(assistant_message.id), usage):
+                yield done
 
             # assistant_token_count = tiktoken.encoding_for_model("gpt-4o").encode(
             #     assistant_message_content
@@ -187,71 +281,81 @@ async def send_chat_message(
 
 
 @router.get("/chat/{chat_id}/fetch/messages")
-async def get_chat_messages(chat_id: str, db: Session = Depends(get_db)):
-    messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.chat_id == chat_id)
-        .order_by(ChatMessage.created_at)
-        .all()
+async def get_chat_messages(
+    chat_id: str,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """The latest messages in chronological order; next_cursor pages back to older ones."""
+    query = (
+        select(
+            ChatMessage.id,
+            ChatMessage.message,
+            ChatMessage.role,
+            ChatMessage.created_at,
+        )
+        .where(ChatMessage.chat_id == chat_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(limit + 1)
     )
+    if cursor:
+        query = query.where(
+            tuple_(ChatMessage.created_at, ChatMessage.id)
+            < tuple_(*decode_cursor(cursor))
+        )
 
+    messages, next_cursor = paginate((await db.execute(query)).all(), limit)
     return {
-        "messages": [{"content": msg.message, "role": msg.role} for msg in messages]
+        "messages": [
+            {"id": msg.id, "content": msg.message, "role": msg.role}
+            for msg in reversed(messages)
+        ],
+        "next_cursor": next_cursor,
     }
 
 
 @router.post("/chat/{chat_id}/bookmark")
-async def bookmark_chat(request: Request, chat_id: str, db: Session = Depends(get_db)):
+async def bookmark_chat(
+    request: Request, chat_id: str, db: AsyncSession = Depends(get_db)
+):
     user_id = request.state.user_id
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
+    chat = await get_chat(db, chat_id, user_id)
 
     setattr(chat, "is_bookmarked", not getattr(chat, "is_bookmarked"))
-    db.commit()
+    await db.commit()
 
     action = "unbookmarked" if not getattr(chat, "is_bookmarked") else "bookmarked"
     return {"message": f"Chat {action}", "status": 200}
 
 
 @router.post("/chat/{chat_id}/delete")
-async def delete_chat(request: Request, chat_id: str, db: Session = Depends(get_db)):
+async def delete_chat(
+    request: Request, chat_id: str, db: AsyncSession = Depends(get_db)
+):
     user_id = request.state.user_id
     try:
-        chat = (
-            db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-        )
-
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
-
-        # Delete vectors from Pinecone
-        index = get_index()
-        list_gen = await asyncio.to_thread(index.list, prefix=str(chat.github_url))
-        list_result = list(list_gen)
-        vector_ids: List[str] = []
-        if list_result:
-            vector_ids = [item for sublist in list_result for item in sublist]
+        chat = await get_chat(db, chat_id, user_id)
 
-        await asyncio.to_thread(index.delete, ids=vector_ids)
+        repo_id = str(chat.repo_id)
+        await db.delete(chat)
+        await db.flush()
 
-        # Delete chat from database once vectors are deleted
-        db.delete(chat)
-        db.commit()
+        # Vectors are shared, so they only go with the repo's last chat
+        await release_repo(db, repo_id)
+        await db.commit()
         return {"success": True, "message": "Chat deleted", "status": 200}
     except Exception as e:
         print(f"Error deleting chat: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/chat/{chat_id}/repo-name")
 async def fetch_repo_name(
-    request: Request, chat_id: str, db: Session = Depends(get_db)
+    request: Request, chat_id: str, db: AsyncSession = Depends(get_db)
 ):
     user_id = request.state.user_id
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
+    chat = await get_chat(db, chat_id, user_id)
 
     return {"repo_name": chat.github_url.split("/")[-1]}
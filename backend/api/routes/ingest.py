@@ -1,49 +1,87 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 import asyncio
+import json
 from pydantic import BaseModel
-from gitingest import ingest
 import re
-import requests
 import uuid
-from sqlalchemy.orm import Session
-from db.config import get_db, SessionLocal
-from db.models import Chat
+from typing import AsyncGenerator
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.config import get_db
+from db.models import Chat, RepoIndex
 import logging
-import tiktoken
-from threading import Lock
-from api.rag import create_embeddings
-from db.pinecone import get_index
-from typing import Dict, Any, cast
+from api.jobs import SKIP_FILES, enqueue_indexing
+from api.index_state import is_indexed, reconcile
+from api.repos import get_chat_repo, get_or_create_repo, get_repo, has_active_job
+from api.progress import TERMINAL_STATUSES, progress_broker
+from api.embeddings import count_tokens
+from api.snapshot import RepoSnapshot, format_files, get_snapshot
+from api.github import RateLimitedError, get_github_client
+from db.pinecone import get_namespace
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Global lock to prevent multiple requests from being processed at the same time
-indexing_locks = {}
+# 100k tokens limit for entire repo but adjust as needed
+MAX_REPO_TOKENS = 100000
+# Code tokenizes at ~3-4 bytes per token; anything above this is over the limit
+MAX_BYTES_PER_TOKEN = 10
+
+
+# Seconds without a published event before the events stream re-reads Postgres.
+# Worker progress is pushed over LISTEN/NOTIFY, so this only covers missed events.
+STATUS_FALLBACK_INTERVAL = 15.0
 
 
 class IngestValidateRequest(BaseModel):
     url: str
 
 
+def indexing_progress(repo: RepoIndex) -> float:
+    if str(repo.indexing_status) == "in_progress" and repo.total_chunks:
+        return (repo.indexed_chunks / repo.total_chunks) * 100
+    return 0
+
+
+def exceeds_token_limit(snapshot: RepoSnapshot, limit: int) -> bool:
+    # Only the files indexing would embed count; binaries and oversized files
+    # are already left out of the snapshot
+    files = snapshot.select(exclude_patterns=SKIP_FILES)
+    total_bytes = sum(file.size for file in files)
+    # Every token covers at least one byte, so small repos need no tokenizing
+    if total_bytes <= limit:
+        return False
+    if total_bytes > limit * MAX_BYTES_PER_TOKEN:
+        return True
+
+    # Count file by file, largest first, and stop as soon as the limit is crossed
+    token_count = 0
+    for file in sorted(files, key=lambda file: file.size, reverse=True):
+        token_count += count_tokens(snapshot.read(file))
+        if token_count > limit:
+            return True
+    return False
+
+
 @router.post("/ingest/validate")
 async def validate(
     request: Request,
     validate_request: IngestValidateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     user_id = request.state.user_id
     try:
         chat = (
-            db.query(Chat)
-            .filter(
-                Chat.github_url == validate_request.url,
-                Chat.user_id == user_id,
+            await db.execute(
+                select(Chat).where(
+                    Chat.github_url == validate_request.url,
+                    Chat.user_id == user_id,
+                )
             )
-            .first()
-        )
+        ).scalar_one_or_none()
         if chat:
             return {"message": f"/chat/{chat.id}"}
 
@@ -53,167 +91,196 @@ async def validate(
         if not match:
             raise HTTPException(status_code=400, detail="Invalid GitHub repository URL")
 
-        # Check if repo is public
-        api_url = f"https://api.github.com/repos/{match.group(1)}/{match.group(2)}"
-        response = requests.get(api_url)
-        if response.status_code == 404:
-            raise HTTPException(
-                status_code=400, detail="Repository doesn't exist or is private"
-            )
-
         clean_url = f"https://github.com/{match.group(1)}/{match.group(2)}"
 
-        # First check if React app through package.json
-        _, _, package_content = await asyncio.to_thread(
-            ingest,
-            clean_url,
-            include_patterns=["package.json", "README.md"],
+        existing_chat = (
+            await db.execute(
+                select(Chat).where(
+                    Chat.github_url == clean_url, Chat.user_id == user_id
+                )
+            )
+        ).scalar_one_or_none()
+        if existing_chat:
+            return {"message": f"/chat/{existing_chat.id}"}
+
+        # Another user's chat already validated this repo; share its index
+        repo = await get_repo(db, get_namespace(clean_url))
+        repo_info = str(repo.repo_info) if repo else await validate_repo(
+            match.group(1), match.group(2), clean_url
         )
 
-        if '"react":' not in package_content and "'react':" not in package_content:
-            raise HTTPException(
-                status_code=400,
-                detail="Not a React app",
-            )
+        chat_id = str(uuid.uuid4().hex[:8])
+        repo = await get_or_create_repo(db, clean_url, repo_info)
+        chat = Chat(
+            id=chat_id,
+            github_url=clean_url,
+            user_id=user_id,
+            repo_id=repo.id,
+        )
+        db.add(chat)
+        await db.commit()
+
+        return {"message": f"/chat/{chat_id}"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Now get the full repo content and file tree and check if token count is too high
-        _, tree, content = await asyncio.to_thread(
-            ingest,
-            clean_url,
+
+async def validate_repo(owner: str, name: str, clean_url: str) -> str:
+    """Check a repo no chat has seen yet, returning its repo_info."""
+    # Check if repo is public
+    try:
+        metadata = await get_github_client().get_repo(f"{owner}/{name}")
+    except RateLimitedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if metadata is None or metadata.get("private"):
+        raise HTTPException(
+            status_code=400, detail="Repository doesn't exist or is private"
         )
 
-        encoding = tiktoken.get_encoding("cl100k_base")
-        token_count = len(encoding.encode(content))
-        # 100k tokens limit for entire repo but adjust as needed
-        if token_count > 100000:
-            raise HTTPException(
-                status_code=400,
-                detail="Sorry, repository is too large (>100k tokens)",
-            )
+    # Fetched once and shared with token counting, repo_info and indexing
+    snapshot = await get_snapshot(clean_url)
 
-        existing_chat = (
-            db.query(Chat)
-            .filter(Chat.github_url == clean_url, Chat.user_id == user_id)
-            .first()
+    # First check if React app through package.json
+    package_content = format_files(
+        snapshot.iter_files(include_patterns=["package.json", "README.md"])
+    )
+
+    if '"react":' not in package_content and "'react':" not in package_content:
+        raise HTTPException(
+            status_code=400,
+            detail="Not a React app",
         )
 
-        chat_id = existing_chat.id if existing_chat else str(uuid.uuid4().hex[:8])
-        repo_info = tree + package_content
+    # Now check if token count is too high
+    if await asyncio.to_thread(exceeds_token_limit, snapshot, MAX_REPO_TOKENS):
+        raise HTTPException(
+            status_code=400,
+            detail="Sorry, repository is too large (>100k tokens)",
+        )
 
-        if not existing_chat:
-            chat = Chat(
-                id=chat_id,
-                github_url=clean_url,
-                user_id=user_id,
-                repo_info=repo_info,
-            )
-            db.add(chat)
-            db.commit()
+    return snapshot.tree() + package_content
 
-        return {"message": f"/chat/{chat_id}"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+async def start_indexing(repo: RepoIndex, db: AsyncSession):
+    repo_id = str(repo.id)
+    setattr(repo, "indexing_status", "in_progress")
+    setattr(repo, "indexed_chunks", 0)
+    # Picked up by the indexing worker (worker.py); a no-op if the repo is already queued
+    await enqueue_indexing(db, repo)
+    await db.commit()
+    progress_broker.publish(repo_id, "in_progress", 0)
+    return {"status": "in_progress"}
+
+
+async def is_indexing(db: AsyncSession, repo: RepoIndex) -> bool:
+    # A repo can be left in_progress without a job to finish it (indexed before
+    # the job queue, or its job row lost); those are queued again
+    return str(repo.indexing_status) == "in_progress" and await has_active_job(
+        db, str(repo.id)
+    )
 
 
 @router.post("/ingest/{chat_id}")
 async def ingest_repo(
-    chat_id: str,
-    request: Request,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    chat_id: str, request: Request, db: AsyncSession = Depends(get_db)
 ):
     user_id = request.state.user_id
-    # Get or create lock for this chat_id
-    if chat_id not in indexing_locks:
-        indexing_locks[chat_id] = Lock()
+    _, repo = await get_chat_repo(db, chat_id, user_id)
 
-    # Try to acquire lock, return if already locked
-    if not indexing_locks[chat_id].acquire(blocking=False):
+    # Postgres is authoritative; Pinecone is only checked for never-indexed repos.
+    # Repos indexed for another user's chat are ready straight away.
+    if is_indexed(repo) or await reconcile(db, repo):
+        return {"status": "completed"}
+    if await is_indexing(db, repo):
         return {"status": "in_progress"}
 
-    try:
-        chat = (
-            db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-        )
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
-
-        # Check if vectors already exist in Pinecone
-        index = get_index()
-        existing_vectors = await asyncio.to_thread(
-            index.query,
-            vector=[0.0] * 3072,
-            filter={"github_url": str(chat.github_url)},
-            top_k=1,
-        )
-
-        existing_vectors = cast(Dict[str, Any], existing_vectors)
-
-        if existing_vectors["matches"]:
-            setattr(chat, "indexing_status", "completed")
-            db.commit()
-            return {"status": "completed"}
-
-        setattr(chat, "indexing_status", "in_progress")
-        db.commit()
-
-        skip_files = [
-            "yarn.lock",
-            "bun.lockb",
-            "package-lock.json",
-            "pnpm-lock.yaml",
-            ".gitignore",
-            ".env*",
-            "tsconfig.json",
-            "prettier.config.js",
-            "postcss.config.js",
-            "next.config.js",
-            ".eslintrc",
-            "tailwind.config",
-        ]
-
-        try:
-            _, _, content = await asyncio.to_thread(
-                ingest,
-                str(chat.github_url),
-                exclude_patterns=skip_files,
-            )
+    return await start_indexing(repo, db)
 
-            # Create a new session for the background task
-            new_db = SessionLocal()
 
-            async def background_task():
-                try:
-                    await create_embeddings(new_db, chat_id, content)
-                except Exception as e:
-                    logger.error(f"Background task failed: {str(e)}")
-                    setattr(chat, "indexing_status", "failed")
-                    db.commit()
-                finally:
-                    new_db.close()
+@router.post("/ingest/{chat_id}/refresh")
+async def refresh_repo(
+    chat_id: str, request: Request, db: AsyncSession = Depends(get_db)
+):
+    # Re-index only the files that changed since the last run, see create_embeddings
+    user_id = request.state.user_id
+    _, repo = await get_chat_repo(db, chat_id, user_id)
 
-            background_tasks.add_task(background_task)
+    if not is_indexed(repo):
+        if await is_indexing(db, repo):
             return {"status": "in_progress"}
-        except Exception as e:
-            logger.error(f"Error in ingest_repo: {str(e)}")
-            setattr(chat, "indexing_status", "failed")
-            db.commit()
-            raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        indexing_locks[chat_id].release()
+        return await start_indexing(repo, db)
+
+    # The repo stays completed, and queryable, while the job applies the diff;
+    # the job row is what marks it as refreshing
+    if not await has_active_job(db, str(repo.id)):
+        await enqueue_indexing(db, repo)
+        await db.commit()
+    return {"status": "refreshing"}
 
 
 @router.get("/ingest/{chat_id}/status")
 async def check_indexing_status(
-    request: Request, chat_id: str, db: Session = Depends(get_db)
+    request: Request, chat_id: str, db: AsyncSession = Depends(get_db)
 ):
     user_id = request.state.user_id
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
+    _, repo = await get_chat_repo(db, chat_id, user_id)
 
-    progress = 0
-    if str(chat.indexing_status) == "in_progress" and chat.total_chunks is not None:
-        progress = (chat.indexed_chunks / chat.total_chunks) * 100
+    return {"status": repo.indexing_status, "progress": indexing_progress(repo)}
 
-    return {"status": chat.indexing_status, "progress": progress}
+
+@router.get("/ingest/{chat_id}/events")
+async def stream_indexing_status(
+    request: Request, chat_id: str, db: AsyncSession = Depends(get_db)
+):
+    """Server-sent indexing progress, replacing polling of /ingest/{chat_id}/status."""
+    user_id = request.state.user_id
+    _, repo = await get_chat_repo(db, chat_id, user_id)
+    repo_id = str(repo.id)
+
+    try:
+        last_event_id = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        last_event_id = 0
+
+    status = str(repo.indexing_status)
+    progress = indexing_progress(repo)
+    # Don't hold a pooled connection for the life of the stream
+    await db.close()
+
+    def format_event(status: str, progress: float, event_id: int | None = None):
+        event = f"id: {event_id}\n" if event_id is not None else ""
+        data = json.dumps({"status": status, "progress": progress})
+        return f"{event}data: {data}\n\n"
+
+    async def stream_events() -> AsyncGenerator[str, None]:
+        # Current state first, so the client can render without waiting for a batch
+        if progress_broker.latest(repo_id) is None:
+            yield format_event(status, progress)
+            if status != "in_progress":
+                return
+
+        async for event in progress_broker.subscribe(
+            repo_id, last_event_id, timeout=STATUS_FALLBACK_INTERVAL
+        ):
+            if event is not None:
+                yield format_event(event.status, event.progress, event.id)
+                if event.status in TERMINAL_STATUSES:
+                    return
+                continue
+
+            # Nothing relayed for a while, e.g. while the LISTEN connection was
+            # reconnecting or the worker is down; fall back to the state in Postgres
+            current = await get_repo(db, repo_id)
+            await db.close()
+            if not current:
+                return
+            current_status = str(current.indexing_status)
+            yield format_event(current_status, indexing_progress(current))
+            if current_status != "in_progress":
+                return
+
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
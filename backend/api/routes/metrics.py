@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from api.answer_cache import answer_cache
+from api.query_cache import get_query_cache
+
+router = APIRouter()
+
+
+@router.get("/metrics/cache")
+async def get_cache_metrics():
+    # Per process; each API worker reports its own caches
+    return {
+        "query_embeddings": get_query_cache().stats(),
+        "answers": answer_cache.stats(),
+    }
@@ -1,127 +1,99 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from sqlalchemy.orm import Session
-from db.models import Chat
+from fastapi.responses import FileResponse, JSONResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.config import get_db
-import io
-import zipfile
-import requests
+from api.repos import get_chat
+from api.snapshot import get_snapshot
 
 router = APIRouter()
 
+# Not worth showing in the file tree
+TREE_EXCLUDE = [
+    "LICENSE",
+    "license",
+    "*.lock",
+    "package-lock.json",
+    "pnpm-lock.yaml",
+]
 
-# @router.get("/repo/{chat_id}")
-# async def get_repo(chat_id: str, user_id: str, db: Session = Depends(get_db)):
-#     chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-#     if not chat:
-#         raise HTTPException(status_code=404, detail="Chat not found")
 
-#     temp_dir = tempfile.mkdtemp()
-
-#     try:
-#         # Clone the repository and store it in temp_dir
-#         Repo.clone_from(str(chat.github_url), temp_dir)
-
-#         # Get all files recursively
-#         files = []
-#         for root, _, filenames in os.walk(temp_dir):
-#             for filename in filenames:
-#                 full_path = os.path.join(root, filename)
-#                 relative_path = os.path.relpath(full_path, temp_dir)
-
-#                 # Skip .git directory, lock files, LICENSE, and common binary files
-#                 if (
-#                     not relative_path.startswith(".git/")
-#                     and not relative_path.lower() == "license"
-#                     and not any(
-#                         relative_path.endswith(ext)
-#                         for ext in [
-#                             ".jpg",
-#                             ".png",
-#                             ".gif",
-#                             ".jpeg",
-#                             ".webp",
-#                             ".svg",
-#                             ".ico",
-#                             "package-lock.json",
-#                             "yarn.lock",
-#                             "pnpm-lock.yaml",
-#                             "bun.lock",
-#                             ".lock",
-#                         ]
-#                     )
-#                 ):
-#                     try:
-#                         with open(full_path, "r") as f:
-#                             content = f.read()
-#                             files.append({"path": relative_path, "content": content})
-#                     except UnicodeDecodeError:
-#                         # Skip binary files
-#                         continue
-
-#         return {"files": files, "github_url": chat.github_url}
-
-#     finally:
-#         # Cleanup temp directory after all files are sent to client
-#         shutil.rmtree(temp_dir)
+def not_modified(request: Request, etag: str) -> bool:
+    return etag in request.headers.get("if-none-match", "")
 
 
 @router.get("/repo/{chat_id}")
-async def get_repo(request: Request, chat_id: str, db: Session = Depends(get_db)):
+async def get_repo(request: Request, chat_id: str, db: AsyncSession = Depends(get_db)):
+    """The repo's file tree with sizes and hashes; contents come from /repo/{chat_id}/file."""
     user_id = request.state.user_id
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-
-    repo_url = chat.github_url.rstrip("/")
-    zip_url = f"{repo_url}/archive/refs/heads/main.zip"
+    chat = await get_chat(db, chat_id, user_id)
+    # Nothing else to read, and the snapshot may take a while to fetch
+    await db.close()
 
     try:
-        response = requests.get(zip_url)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to get repository")
-
-        zip_data = io.BytesIO(response.content)
-        with zipfile.ZipFile(zip_data, "r") as archive:
-            files = []
-
-            for file_info in archive.infolist():
-                if file_info.is_dir():
-                    continue
-
-                _, _, relative_path = file_info.filename.partition("/")
-
-                if (
-                    relative_path.startswith(".git/")
-                    or relative_path.lower() == "license"
-                    or any(
-                        relative_path.endswith(ext)
-                        for ext in [
-                            ".jpg",
-                            ".png",
-                            ".gif",
-                            ".jpeg",
-                            ".webp",
-                            ".svg",
-                            ".ico",
-                            "package-lock.json",
-                            "yarn.lock",
-                            "pnpm-lock.yaml",
-                            "bun.lock",
-                            ".lock",
-                            "LICENSE",
-                        ]
-                    )
-                ):
-                    continue
-
-                try:
-                    content_bytes = archive.read(file_info.filename)
-                    content = content_bytes.decode("utf-8", errors="ignore")
-                except Exception:
-                    continue
+        snapshot = await get_snapshot(str(chat.github_url))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-                files.append({"path": relative_path, "content": content})
+    # The tree only changes with the commit
+    etag = f'"{snapshot.commit_sha}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    files = [
+        {"path": file.path, "size": file.size, "sha": file.sha}
+        for file in snapshot.select(exclude_patterns=TREE_EXCLUDE)
+    ]
+    return JSONResponse(
+        content={
+            "files": files,
+            "github_url": chat.github_url,
+            "commit_sha": snapshot.commit_sha,
+        },
+        headers=headers,
+    )
+
+
+@router.get("/repo/{chat_id}/file")
+async def get_repo_file(
+    request: Request,
+    chat_id: str,
+    path: str,
+    ref: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Contents of one file, at commit `ref` if given. Supports If-None-Match and Range."""
+    user_id = request.state.user_id
+    chat = await get_chat(db, chat_id, user_id)
+    # Nothing else to read, and the snapshot may take a while to fetch
+    await db.close()
 
-        return {"files": files, "github_url": chat.github_url}
+    try:
+        snapshot = await get_snapshot(str(chat.github_url), ref)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    file = snapshot.file(path)
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # Blobs are content-addressed, so the hash is a strong validator and a file at
+    # a pinned commit never changes
+    etag = f'"{file.sha}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": (
+            "private, max-age=31536000, immutable" if ref else "private, no-cache"
+        ),
+    }
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse answers Range requests with 206 partial content
+    return FileResponse(
+        snapshot.blob_path(file),
+        media_type="text/plain; charset=utf-8",
+        headers=headers,
+    )
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -8,9 +9,18 @@ import os
 
 load_dotenv()
 
-from api.routes import auth, ingest, repo, chat
+from api.routes import auth, ingest, repo, chat, metrics
+from api.progress import relay_progress
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Indexing progress is published by the worker process, see worker.py
+    async with relay_progress():
+        yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 cors_origins = os.getenv("CORS_ORIGINS")
 if cors_origins:
@@ -45,3 +55,4 @@ app.include_router(auth.router)
 app.include_router(ingest.router)
 app.include_router(repo.router)
 app.include_router(chat.router)
+app.include_router(metrics.router)
@@ -0,0 +1,403 @@
+import asyncio
+import bisect
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import tarfile
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from api.github import get_github_client
+
+SNAPSHOT_DIR = Path(
+    os.getenv("SNAPSHOT_CACHE_DIR")
+    or os.path.join(tempfile.gettempdir(), "reactchat-snapshots")
+)
+# Seconds a repo's resolved HEAD commit is trusted before asking GitHub again.
+# Snapshots themselves are per commit and never go stale.
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL") or 3600)
+# Seconds a snapshot is kept after it was last used; its blobs go with it once
+# no other snapshot references them
+SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE") or 7 * 24 * 60 * 60)
+# Seconds between eviction sweeps in this process
+SNAPSHOT_SWEEP_INTERVAL = 60 * 60
+MAX_FILE_SIZE = 10 * 1024 * 1024
+
+# Never part of a snapshot: VCS metadata, dependencies, lock files, build output
+# and binaries
+IGNORE_PATTERNS = [
+    ".git/*",
+    "*/.git/*",
+    ".gitignore",
+    ".DS_Store",
+    "node_modules/*",
+    "*/node_modules/*",
+    "dist/*",
+    "build/*",
+    ".next/*",
+    "out/*",
+    "coverage/*",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.ico",
+    "*.svg",
+    "*.mp4",
+    "*.mp3",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.eot",
+    "*.otf",
+    "*.pdf",
+    "*.zip",
+    "*.gz",
+    "*.lockb",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "bun.lock",
+]
+
+
+def matches(path: str, patterns: Iterable[str]) -> bool:
+    name = path.rsplit("/", 1)[-1]
+    return any(
+        fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in patterns
+    )
+
+
+@dataclass
+class SnapshotFile:
+    path: str
+    size: int
+    sha: str
+
+
+COMMIT_SHA = re.compile(r"^[0-9a-f]{40}$")
+
+
+@dataclass
+class RepoSnapshot:
+    github_url: str
+    commit_sha: str
+    fetched_at: float
+    # Sorted by path
+    files: List[SnapshotFile]
+
+    def read(self, file: SnapshotFile) -> str:
+        return _blob_path(file.sha).read_bytes().decode("utf-8")
+
+    def blob_path(self, file: SnapshotFile) -> Path:
+        return _blob_path(file.sha)
+
+    def file(self, path: str) -> Optional[SnapshotFile]:
+        i = bisect.bisect_left(self.files, path, key=lambda file: file.path)
+        if i < len(self.files) and self.files[i].path == path:
+            return self.files[i]
+        return None
+
+    def select(
+        self,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+    ) -> List[SnapshotFile]:
+        return [
+            file
+            for file in self.files
+            if (include_patterns is None or matches(file.path, include_patterns))
+            and not (exclude_patterns and matches(file.path, exclude_patterns))
+        ]
+
+    def iter_files(
+        self,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+    ) -> Iterator[Tuple[str, str]]:
+        for file in self.select(include_patterns, exclude_patterns):
+            yield file.path, self.read(file)
+
+    def tree(self) -> str:
+        root: Dict[str, dict] = {}
+        for file in self.files:
+            node = root
+            for part in file.path.split("/"):
+                node = node.setdefault(part, {})
+
+        repo_name = "-".join(self.github_url.rstrip("/").split("/")[-2:])
+        lines = ["Directory structure:", f"└── {repo_name}/"]
+
+        def walk(node: Dict[str, dict], prefix: str):
+            # Directories first, then files, both alphabetical
+            entries = sorted(node.items(), key=lambda item: (not item[1], item[0]))
+            for i, (name, children) in enumerate(entries):
+                last = i == len(entries) - 1
+                connector = "└── " if last else "├── "
+                lines.append(f"{prefix}{connector}{name}{'/' if children else ''}")
+                if children:
+                    walk(children, prefix + ("    " if last else "│   "))
+
+        walk(root, "    ")
+        return "\n".join(lines) + "\n"
+
+
+def format_files(files: Iterable[Tuple[str, str]]) -> str:
+    # Same layout gitingest produces, which the prompts were written against
+    separator = "=" * 48
+    return "".join(
+        f"\n{separator}\nFile: {path}\n{separator}\n{content}\n"
+        for path, content in files
+    )
+
+
+def _blob_path(sha: str) -> Path:
+    return SNAPSHOT_DIR / "blobs" / sha[:2] / sha
+
+
+def _repo_dir(github_url: str) -> Path:
+    key = hashlib.sha256(github_url.encode("utf-8")).hexdigest()
+    return SNAPSHOT_DIR / "repos" / key
+
+
+def _manifest_path(github_url: str, commit_sha: str) -> Path:
+    return _repo_dir(github_url) / f"{commit_sha}.json"
+
+
+def _head_path(github_url: str) -> Path:
+    return _repo_dir(github_url) / "HEAD.json"
+
+
+def _repo_path(github_url: str) -> str:
+    match = re.match(r"^(?:https://)?github\.com/([^/]+)/([^/]+)", github_url)
+    if not match:
+        raise ValueError(f"Not a GitHub repository URL: {github_url}")
+    return f"{match.group(1)}/{match.group(2)}"
+
+
+def _write_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    tmp_path.replace(path)
+
+
+def _extract(archive_path: str) -> Tuple[List[SnapshotFile], Optional[str]]:
+    files = []
+    with tarfile.open(archive_path, "r:gz") as archive:
+        for member in archive:
+            if not member.isfile() or member.size > MAX_FILE_SIZE:
+                continue
+
+            # Strip the "<repo>-<ref>/" directory GitHub wraps archives in
+            _, _, path = member.name.partition("/")
+            if not path or matches(path, IGNORE_PATTERNS):
+                continue
+
+            extracted = archive.extractfile(member)
+            if extracted is None:
+                continue
+            data = extracted.read()
+            try:
+                data.decode("utf-8")
+            except UnicodeDecodeError:
+                # Binary file
+                continue
+
+            sha = hashlib.sha256(data).hexdigest()
+            blob_path = _blob_path(sha)
+            try:
+                # Reused blobs are marked fresh so a concurrent sweep leaves them
+                # alone until this snapshot's manifest references them
+                os.utime(blob_path)
+            except FileNotFoundError:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = blob_path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_bytes(data)
+                tmp_path.replace(blob_path)
+
+            files.append(SnapshotFile(path=path, size=len(data), sha=sha))
+
+    files.sort(key=lambda file: file.path)
+    # GitHub archives carry the commit they were made from in the pax header
+    return files, archive.pax_headers.get("comment")
+
+
+def _load_manifest(github_url: str, commit_sha: str) -> Optional[RepoSnapshot]:
+    manifest_path = _manifest_path(github_url, commit_sha)
+    try:
+        data = json.loads(manifest_path.read_text())
+        # The manifest's mtime is when the snapshot was last used
+        os.utime(manifest_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    files = [SnapshotFile(**file) for file in data["files"]]
+    # Blobs may have been cleaned up independently of the manifest
+    if not all(_blob_path(file.sha).exists() for file in files):
+        return None
+
+    return RepoSnapshot(
+        github_url=github_url,
+        commit_sha=commit_sha,
+        fetched_at=data["fetched_at"],
+        files=files,
+    )
+
+
+def _load_head(github_url: str, max_age: Optional[float]) -> Optional[str]:
+    try:
+        data = json.loads(_head_path(github_url).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if max_age is not None and time.time() - data["resolved_at"] > max_age:
+        return None
+    return data["commit_sha"]
+
+
+def _save_head(github_url: str, commit_sha: str):
+    _write_json(
+        _head_path(github_url),
+        {"commit_sha": commit_sha, "resolved_at": time.time()},
+    )
+
+
+async def _resolve_head(github_url: str) -> Optional[str]:
+    """The default branch's commit, from cache within SNAPSHOT_TTL, else GitHub."""
+    commit_sha = await asyncio.to_thread(_load_head, github_url, SNAPSHOT_TTL)
+    if commit_sha:
+        return commit_sha
+
+    try:
+        commit_sha = await get_github_client().get_commit_sha(_repo_path(github_url))
+        if commit_sha and COMMIT_SHA.match(commit_sha):
+            await asyncio.to_thread(_save_head, github_url, commit_sha)
+            return commit_sha
+    except Exception:
+        pass
+
+    # GitHub unavailable or rate limited; a stale commit beats no snapshot
+    return await asyncio.to_thread(_load_head, github_url, None)
+
+
+def _evict(max_age: float):
+    """Removes snapshots unused for max_age seconds, then blobs none of the rest use."""
+    cutoff = time.time() - max_age
+    referenced = set()
+
+    for repo_dir in (SNAPSHOT_DIR / "repos").glob("*"):
+        for path in repo_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    continue
+                if path.name == "HEAD.json" or path.suffix != ".json":
+                    continue
+                data = json.loads(path.read_text())
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            referenced.update(file["sha"] for file in data["files"])
+        try:
+            repo_dir.rmdir()
+        except OSError:
+            # Not empty
+            pass
+
+    for blob_path in (SNAPSHOT_DIR / "blobs").glob("*/*"):
+        # Recent blobs may belong to a snapshot whose manifest isn't written yet
+        try:
+            if blob_path.name not in referenced and blob_path.stat().st_mtime < cutoff:
+                blob_path.unlink()
+        except FileNotFoundError:
+            continue
+
+
+_last_sweep = 0.0
+
+
+async def _maybe_evict():
+    global _last_sweep
+    if time.monotonic() - _last_sweep < SNAPSHOT_SWEEP_INTERVAL:
+        return
+    _last_sweep = time.monotonic()
+    try:
+        await asyncio.to_thread(_evict, SNAPSHOT_MAX_AGE)
+    except OSError:
+        # Best effort; the next sweep tries again
+        pass
+
+
+async def _download(github_url: str, ref: str) -> RepoSnapshot:
+    with tempfile.NamedTemporaryFile(suffix=".tar.gz") as archive:
+        client = get_github_client()
+        async with client.stream_archive(_repo_path(github_url), ref) as response:
+            async for data in response.aiter_bytes():
+                await asyncio.to_thread(archive.write, data)
+        await asyncio.to_thread(archive.flush)
+
+        files, archive_sha = await asyncio.to_thread(_extract, archive.name)
+
+    commit_sha = ref if COMMIT_SHA.match(ref) else archive_sha
+    if not commit_sha or not COMMIT_SHA.match(commit_sha):
+        raise Exception("Could not determine the repository's commit")
+
+    snapshot = RepoSnapshot(
+        github_url=github_url,
+        commit_sha=commit_sha,
+        fetched_at=time.time(),
+        files=files,
+    )
+    data = asdict(snapshot)
+    del data["github_url"], data["commit_sha"]
+    await asyncio.to_thread(
+        _write_json, _manifest_path(github_url, commit_sha), data
+    )
+    if ref == "HEAD":
+        await asyncio.to_thread(_save_head, github_url, commit_sha)
+    await _maybe_evict()
+    return snapshot
+
+
+async def _load_or_download(github_url: str, commit_sha: Optional[str]) -> RepoSnapshot:
+    if commit_sha is None:
+        commit_sha = await _resolve_head(github_url)
+    if commit_sha is not None:
+        snapshot = await asyncio.to_thread(_load_manifest, github_url, commit_sha)
+        if snapshot is not None:
+            return snapshot
+    # HEAD resolves to the default branch, whatever it is called
+    return await _download(github_url, commit_sha or "HEAD")
+
+
+# In-flight fetches, so concurrent callers for the same commit share one download
+_fetches: Dict[Tuple[str, Optional[str]], asyncio.Task] = {}
+
+
+async def get_snapshot(
+    github_url: str, commit_sha: Optional[str] = None
+) -> RepoSnapshot:
+    """Snapshot of the repo at commit_sha, or at the default branch's latest commit.
+
+    Each commit is downloaded once and kept on disk until unused for SNAPSHOT_MAX_AGE.
+    """
+    if commit_sha is not None and not COMMIT_SHA.match(commit_sha):
+        raise ValueError(f"Not a commit SHA: {commit_sha}")
+
+    key = (github_url, commit_sha)
+    task = _fetches.get(key)
+    if task is None:
+        task = asyncio.create_task(_load_or_download(github_url, commit_sha))
+        _fetches[key] = task
+        task.add_done_callback(lambda _: _fetches.pop(key, None))
+    return await asyncio.shield(task)
@@ -0,0 +1,177 @@
+"""Compare the old BaseHTTPMiddleware auth layer with the pure ASGI ClerkAuthMiddleware.
+
+Drives a stub streaming chat route directly over ASGI. The stub streams SSE
+events the way send_chat_message does. Tokens are signed with a throwaway RSA
+key and both layers use the same local verifier, so the numbers show only the
+cost of the middleware itself. No Clerk account or network is needed:
+
+    python -m benchmarks.auth_middleware --requests 2000 --concurrency 20 --events 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+os.environ.setdefault("CLERK_SECRET_KEY", "sk_test_benchmark")
+
+from api.clerk import ClerkTokenVerifier, session_token  # noqa: E402
+from api.middleware import ClerkAuthMiddleware  # noqa: E402
+
+
+class BufferingAuthMiddleware(BaseHTTPMiddleware):
+    """Shaped like the previous ClerkAuthMiddleware: buffer the body, then authenticate."""
+
+    def __init__(self, app, verifier: ClerkTokenVerifier):
+        super().__init__(app)
+        self.verifier = verifier
+
+    async def dispatch(self, request: Request, call_next):
+        try:
+            await request.body()
+            token = session_token(request.headers)
+            request.state.user_id = await self.verifier.verify(token or "")
+        except Exception as e:
+            return JSONResponse(status_code=401, content={"error": str(e)})
+        return await call_next(request)
+
+
+def create_keys():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    now = int(time.time())
+    token = jwt.encode(
+        {"sub": "user_benchmark", "iat": now, "exp": now + 3600},
+        private_key,
+        algorithm="RS256",
+    )
+    return token, public_pem.decode()
+
+
+def create_app(middleware, verifier: ClerkTokenVerifier, events: int):
+    app = FastAPI()
+    event = "data: " + json.dumps({"type": "delta", "content": "x" * 24}) + "\n\n"
+
+    @app.post("/chat/{chat_id}")
+    async def chat(chat_id: str, request: Request):
+        await request.json()
+        assert request.state.user_id == "user_benchmark"
+
+        async def generate():
+            for _ in range(events):
+                yield event
+                await asyncio.sleep(0)
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    app.add_middleware(middleware, verifier=verifier)
+    return app
+
+
+async def request_once(app, token: str, body: bytes) -> tuple[float, float]:
+    """One streamed POST over ASGI, returning (time to first byte, total time)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat/benchmark",
+        "raw_path": b"/chat/benchmark",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"authorization", f"Bearer {token}".encode()),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # The client never disconnects; the server stops listening once the stream ends
+        await asyncio.Future()
+
+    first_byte = None
+    status = None
+
+    async def send(message):
+        nonlocal first_byte, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            if first_byte is None:
+                first_byte = time.perf_counter()
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    finished = time.perf_counter()
+    if status != 200 or first_byte is None:
+        raise RuntimeError(f"Request failed with status {status}")
+    return first_byte - started, finished - started
+
+
+async def run(app, token: str, requests: int, concurrency: int):
+    body = json.dumps({"message": "How does routing work?", "model": "gpt-4o"}).encode()
+    # Warm up so route compilation and the token cache aren't measured
+    await request_once(app, token, body)
+
+    ttfbs: list[float] = []
+    started = time.perf_counter()
+    for offset in range(0, requests, concurrency):
+        batch = min(concurrency, requests - offset)
+        results = await asyncio.gather(
+            *[request_once(app, token, body) for _ in range(batch)]
+        )
+        ttfbs.extend(ttfb for ttfb, _ in results)
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, ttfbs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--events", type=int, default=50)
+    args = parser.parse_args()
+
+    token, public_pem = create_keys()
+    verifier = ClerkTokenVerifier(jwt_key=public_pem)
+
+    print(f"{'middleware':>16} {'req/s':>10} {'ttfb p50 us':>12} {'ttfb p95 us':>12}")
+    results = {}
+    for name, middleware in (
+        ("BaseHTTP", BufferingAuthMiddleware),
+        ("pure ASGI", ClerkAuthMiddleware),
+    ):
+        app = create_app(middleware, verifier, args.events)
+        rps, ttfbs = asyncio.run(run(app, token, args.requests, args.concurrency))
+        p50 = statistics.median(ttfbs)
+        p95 = statistics.quantiles(ttfbs, n=20)[-1]
+        results[name] = (rps, p50)
+        print(f"{name:>16} {rps:>10,.0f} {p50 * 1e6:>12,.0f} {p95 * 1e6:>12,.0f}")
+
+    before, after = results["BaseHTTP"], results["pure ASGI"]
+    print(
+        f"pure ASGI serves {after[0] / before[0]:.2f}x the requests/sec with "
+        f"{before[1] / after[1]:.2f}x lower median time to first byte"
+    )
+
+
+if __name__ == "__main__":
+    main()
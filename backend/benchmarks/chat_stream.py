@@ -0,0 +1,73 @@
+"""Compare bytes sent and server CPU of the legacy and delta chat stream protocols.
+
+Feeds a synthetic answer token by token through ChatStreamEncoder, the same code
+send_chat_message streams through, so no API key or network is needed:
+
+    python -m benchmarks.chat_stream --tokens 500 2000 8000
+"""
+
+import argparse
+import random
+import string
+import time
+
+from api.chat_stream import (
+    DELTA_STREAM_VERSION,
+    LEGACY_STREAM_VERSION,
+    ChatStreamEncoder,
+)
+
+
+def synthetic_tokens(count: int, seed: int = 0):
+    # Roughly the shape of model output: short words, some code-ish punctuation
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + "{}()<>=;:.,'\"`\n"
+    return [
+        " " + "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 6)))
+        for _ in range(count)
+    ]
+
+
+def run(version: int, tokens, repeats: int):
+    best_cpu = float("inf")
+    sent = 0
+    for _ in range(repeats):
+        encoder = ChatStreamEncoder(version)
+        sent = 0
+        started = time.process_time()
+        for token in tokens:
+            sent += len(encoder.delta(token).encode("utf-8"))
+        sent += len(encoder.done("message-id", {"total_tokens": len(tokens)}).encode())
+        best_cpu = min(best_cpu, time.process_time() - started)
+    return sent, best_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8} {'protocol':>8} {'bytes':>14} {'cpu ms':>10}")
+    for count in args.tokens:
+        tokens = synthetic_tokens(count)
+        answer_bytes = len("".join(tokens).encode("utf-8"))
+        results = {}
+        for name, version in (
+            ("legacy", LEGACY_STREAM_VERSION),
+            ("delta", DELTA_STREAM_VERSION),
+        ):
+            sent, cpu = run(version, tokens, args.repeats)
+            results[name] = (sent, cpu)
+            print(f"{count:>8} {name:>8} {sent:>14,} {cpu * 1000:>10.1f}")
+
+        legacy, delta = results["legacy"], results["delta"]
+        print(
+            f"{'':>8} {'':>8} answer is {answer_bytes:,} bytes; delta sends "
+            f"{legacy[0] / delta[0]:.1f}x fewer bytes using "
+            f"{legacy[1] / max(delta[1], 1e-9):.1f}x less CPU"
+        )
+
+
+if __name__ == "__main__":
+    main()
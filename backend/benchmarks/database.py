@@ -0,0 +1,82 @@
+"""Compare the blocking psycopg2 session with the asyncpg AsyncSession under concurrency.
+
+Needs a local Postgres in DATABASE_URL; nothing is written to it. Each round runs
+--concurrency requests at once. Every request issues a query that takes
+--query-ms, the way a slow query would. The benchmark measures wall time and the
+worst event loop stall, which is how long every concurrent SSE stream on the
+worker froze:
+
+    python -m benchmarks.database --concurrency 50 --query-ms 50
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.github import measure
+from db.config import DATABASE_URL, async_database_url
+
+
+async def blocking(url: str, concurrency: int, pool_size: int, query_seconds: float):
+    # What the routes used to do: sync session calls inside async handlers
+    engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+    Session = sessionmaker(bind=engine)
+
+    async def run(i: int):
+        with Session() as db:
+            db.execute(text("SELECT pg_sleep(:s)"), {"s": query_seconds})
+
+    try:
+        return await measure(run, concurrency)
+    finally:
+        engine.dispose()
+
+
+async def pooled(url: str, concurrency: int, pool_size: int, query_seconds: float):
+    engine = create_async_engine(
+        async_database_url(url), pool_size=pool_size, max_overflow=0
+    )
+    Session = async_sessionmaker(engine)
+
+    async def run(i: int):
+        async with Session() as db:
+            await db.execute(text("SELECT pg_sleep(:s)"), {"s": query_seconds})
+
+    try:
+        # Open the pool's connections first, as a warm server would have
+        await measure(run, pool_size)
+        return await measure(run, concurrency)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=50)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    url = str(DATABASE_URL)
+    query_seconds = args.query_ms / 1000
+
+    def report(name: str, elapsed: float, stall: float):
+        print(
+            f"{name:>14}: {elapsed:6.2f}s wall, {stall * 1000:7.1f}ms worst loop stall"
+        )
+
+    report(
+        "psycopg2",
+        *asyncio.run(blocking(url, args.concurrency, args.pool_size, query_seconds)),
+    )
+    report(
+        "asyncpg",
+        *asyncio.run(pooled(url, args.concurrency, args.pool_size, query_seconds)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Compare per-chunk aembed_query fan-out with the batched embedding pipeline.
+
+Runs a local stub of the OpenAI embeddings endpoint, so no API key or network is needed:
+
+    python -m benchmarks.embeddings --chunks 400 --latency-ms 300 --max-concurrent 8
+"""
+
+import argparse
+import asyncio
+import base64
+import random
+import socket
+import struct
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from langchain_openai import OpenAIEmbeddings
+
+from api.embeddings import BatchEmbedder, batch_chunks, create_embeddings_client
+
+DIMENSIONS = 64
+
+
+def create_stub_app(latency: float, per_input_latency: float, max_concurrent: int):
+    app = FastAPI()
+    state = {"in_flight": 0, "requests": 0, "throttled": 0}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        state["requests"] += 1
+
+        if state["in_flight"] >= max_concurrent:
+            state["throttled"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "0.2"},
+                content={"error": {"message": "Rate limit reached", "type": "requests"}},
+            )
+
+        state["in_flight"] += 1
+        try:
+            await asyncio.sleep(latency + per_input_latency * len(inputs))
+        finally:
+            state["in_flight"] -= 1
+
+        data = []
+        for i in range(len(inputs)):
+            vector = [random.random() for _ in range(DIMENSIONS)]
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(
+                    struct.pack(f"<{DIMENSIONS}f", *vector)
+                ).decode()
+            else:
+                embedding = vector
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        return {
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    return app, state
+
+
+def start_server(app) -> tuple[uvicorn.Server, int]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, port
+
+
+def make_chunks(count: int) -> list[dict]:
+    words = ["const", "useState", "return", "props", "=>", "export", "default", "div"]
+    return [
+        {"content": " ".join(random.choices(words, k=350)), "metadata": {}}
+        for _ in range(count)
+    ]
+
+
+async def per_chunk(base_url: str, chunks: list[dict]) -> None:
+    # What create_embeddings used to do: one request per chunk, 20 at a time
+    embeddings = OpenAIEmbeddings(
+        model="text-embedding-3-large",
+        base_url=base_url,
+        api_key="stub",
+        max_retries=6,
+        check_embedding_ctx_length=False,
+    )
+    for i in range(0, len(chunks), 20):
+        await asyncio.gather(
+            *[embeddings.aembed_query(c["content"]) for c in chunks[i : i + 20]]
+        )
+
+
+async def batched(base_url: str, chunks: list[dict]) -> None:
+    embedder = BatchEmbedder(
+        create_embeddings_client(base_url=base_url, api_key="stub")
+    )
+    async for _ in embedder.embed_batches(batch_chunks(chunks, max_size=64)):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--per-input-ms", type=float, default=2)
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    args = parser.parse_args()
+
+    app, state = create_stub_app(
+        args.latency_ms / 1000, args.per_input_ms / 1000, args.max_concurrent
+    )
+    server, port = start_server(app)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    chunks = make_chunks(args.chunks)
+
+    for name, run in [("per-chunk", per_chunk), ("batched", batched)]:
+        state.update(requests=0, throttled=0)
+        start = time.perf_counter()
+        asyncio.run(run(base_url, chunks))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:>10}: {len(chunks) / elapsed:8.1f} chunks/sec "
+            f"({elapsed:.2f}s, {state['requests']} requests, {state['throttled']} throttled)"
+        )
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
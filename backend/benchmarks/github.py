@@ -0,0 +1,118 @@
+"""Compare blocking requests.get with the shared async GitHubClient under concurrency.
+
+Runs a local stub of the GitHub repos API, so no token or network is needed. Each
+round validates --concurrency repos at once, the way simultaneous /ingest/validate
+calls would, and measures wall time and the worst event loop stall:
+
+    python -m benchmarks.github --concurrency 20 --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import hashlib
+import time
+
+import requests
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from api.github import GitHubClient
+from benchmarks.embeddings import start_server
+
+
+def create_stub_app(latency: float):
+    app = FastAPI()
+    state = {"requests": 0, "not_modified": 0}
+
+    @app.get("/repos/{owner}/{name}")
+    async def get_repo(owner: str, name: str, request: Request):
+        state["requests"] += 1
+        await asyncio.sleep(latency)
+
+        etag = '"' + hashlib.sha1(f"{owner}/{name}".encode()).hexdigest() + '"'
+        headers = {
+            "ETag": etag,
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "4999",
+            "X-RateLimit-Reset": str(int(time.time()) + 3600),
+        }
+        if request.headers.get("if-none-match") == etag:
+            state["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(
+            {"full_name": f"{owner}/{name}", "private": False}, headers=headers
+        )
+
+    return app, state
+
+
+async def measure(run, concurrency: int):
+    """Run `run(i)` concurrently, returning (wall seconds, worst loop stall seconds)."""
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        while not done:
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stall = max(stall, time.perf_counter() - before - 0.01)
+
+    watcher = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*[run(i) for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    done = True
+    await watcher
+    return elapsed, stall
+
+
+async def blocking(base_url: str, concurrency: int):
+    # What validate used to do: requests.get inside an async handler
+    async def run(i: int):
+        requests.get(f"{base_url}/repos/owner/repo-{i}")
+
+    return await measure(run, concurrency)
+
+
+async def pooled(client: GitHubClient, concurrency: int):
+    async def run(i: int):
+        await client.get_repo(f"owner/repo-{i}")
+
+    return await measure(run, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    app, state = create_stub_app(args.latency_ms / 1000)
+    server, port = start_server(app)
+    base_url = f"http://127.0.0.1:{port}"
+
+    def report(name: str, elapsed: float, stall: float):
+        print(
+            f"{name:>16}: {elapsed:6.2f}s wall, {stall * 1000:7.1f}ms worst loop stall "
+            f"({state['requests']} requests, {state['not_modified']} not modified)"
+        )
+        state.update(requests=0, not_modified=0)
+
+    report("requests.get", *asyncio.run(blocking(base_url, args.concurrency)))
+
+    async def client_rounds():
+        client = GitHubClient(api_url=base_url, token=None)
+        try:
+            report("GitHubClient", *await pooled(client, args.concurrency))
+            # Same repos again: revalidated with If-None-Match
+            report("GitHubClient 304", *await pooled(client, args.concurrency))
+        finally:
+            await client.aclose()
+
+    asyncio.run(client_rounds())
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
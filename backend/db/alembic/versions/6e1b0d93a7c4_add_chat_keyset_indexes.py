@@ -0,0 +1,33 @@
+"""Add chat keyset indexes
+
+Revision ID: 6e1b0d93a7c4
+Revises: 2c7e9a41b5d6
+Create Date: 2026-10-17 19:08:45.217306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1b0d93a7c4'
+down_revision: Union[str, None] = '2c7e9a41b5d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so chats and messages stay writable while the indexes build
+    with op.get_context().autocommit_block():
+        op.create_index('ix_chats_user_id_created_at', 'chats', ['user_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_chat_messages_chat_id_created_at', 'chat_messages', ['chat_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+        # Covered by the composite index's leading column
+        op.drop_index('ix_chat_messages_chat_id', table_name='chat_messages', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_chat_messages_chat_id', 'chat_messages', ['chat_id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_chat_messages_chat_id_created_at', table_name='chat_messages', postgresql_concurrently=True)
+        op.drop_index('ix_chats_user_id_created_at', table_name='chats', postgresql_concurrently=True)
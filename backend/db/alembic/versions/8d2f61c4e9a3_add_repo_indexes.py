@@ -0,0 +1,112 @@
+"""Add repo indexes shared between chats
+
+Revision ID: 8d2f61c4e9a3
+Revises: 5a9b3e7c0f12
+Create Date: 2026-10-17 16:08:37.215940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f61c4e9a3'
+down_revision: Union[str, None] = '5a9b3e7c0f12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Same mapping as db.pinecone.get_namespace
+NAMESPACE_SQL = (
+    "regexp_replace(regexp_replace(rtrim(github_url, '/'), "
+    "'^(https://)?github\\.com/', ''), '[^a-zA-Z0-9._/-]', '_', 'g')"
+)
+
+
+def upgrade() -> None:
+    op.create_table('repo_indexes',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('github_url', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('repo_info', sa.String(), nullable=True),
+    sa.Column('indexing_status', sa.String(), nullable=True),
+    sa.Column('total_chunks', sa.Integer(), nullable=True),
+    sa.Column('indexed_chunks', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_repo_indexes_id'), 'repo_indexes', ['id'], unique=False)
+    op.create_index(op.f('ix_repo_indexes_github_url'), 'repo_indexes', ['github_url'], unique=True)
+
+    # Every existing chat owns its repo, so copy its state over as is
+    op.execute(
+        f"""
+        INSERT INTO repo_indexes (id, github_url, created_at, repo_info, indexing_status, total_chunks, indexed_chunks)
+        SELECT {NAMESPACE_SQL}, github_url, created_at, repo_info, indexing_status, total_chunks, indexed_chunks
+        FROM chats WHERE github_url IS NOT NULL
+        """
+    )
+
+    op.add_column('chats', sa.Column('repo_id', sa.String(), nullable=True))
+    op.execute(f"UPDATE chats SET repo_id = {NAMESPACE_SQL} WHERE github_url IS NOT NULL")
+    op.create_index(op.f('ix_chats_repo_id'), 'chats', ['repo_id'], unique=False)
+    op.create_foreign_key('chats_repo_id_fkey', 'chats', 'repo_indexes', ['repo_id'], ['id'])
+    op.drop_index('ix_chats_github_url', table_name='chats')
+    op.create_index(op.f('ix_chats_github_url'), 'chats', ['github_url'], unique=False)
+    op.drop_column('chats', 'repo_info')
+    op.drop_column('chats', 'indexing_status')
+    op.drop_column('chats', 'total_chunks')
+    op.drop_column('chats', 'indexed_chunks')
+
+    # Jobs were already one per namespace, which is now the repo id
+    op.drop_index('ix_indexing_jobs_active_namespace', table_name='indexing_jobs', postgresql_where=sa.text("status IN ('queued', 'running')"))
+    op.drop_index('ix_indexing_jobs_chat_id', table_name='indexing_jobs')
+    op.drop_constraint('indexing_jobs_chat_id_fkey', 'indexing_jobs', type_='foreignkey')
+    op.drop_column('indexing_jobs', 'chat_id')
+    op.alter_column('indexing_jobs', 'namespace', new_column_name='repo_id')
+    op.execute("DELETE FROM indexing_jobs WHERE repo_id NOT IN (SELECT id FROM repo_indexes)")
+    op.create_foreign_key('indexing_jobs_repo_id_fkey', 'indexing_jobs', 'repo_indexes', ['repo_id'], ['id'], ondelete='CASCADE')
+    op.create_index('ix_indexing_jobs_active_repo_id', 'indexing_jobs', ['repo_id'], unique=True, postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_indexing_jobs_active_repo_id', table_name='indexing_jobs', postgresql_where=sa.text("status IN ('queued', 'running')"))
+    op.drop_constraint('indexing_jobs_repo_id_fkey', 'indexing_jobs', type_='foreignkey')
+    op.alter_column('indexing_jobs', 'repo_id', new_column_name='namespace')
+    op.add_column('indexing_jobs', sa.Column('chat_id', sa.VARCHAR(), autoincrement=False, nullable=True))
+    op.execute(
+        "UPDATE indexing_jobs SET chat_id = (SELECT id FROM chats "
+        "WHERE chats.repo_id = indexing_jobs.namespace ORDER BY created_at LIMIT 1)"
+    )
+    op.create_foreign_key('indexing_jobs_chat_id_fkey', 'indexing_jobs', 'chats', ['chat_id'], ['id'], ondelete='CASCADE')
+    op.create_index('ix_indexing_jobs_chat_id', 'indexing_jobs', ['chat_id'], unique=False)
+    op.create_index('ix_indexing_jobs_active_namespace', 'indexing_jobs', ['namespace'], unique=True, postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+    op.add_column('chats', sa.Column('indexed_chunks', sa.INTEGER(), autoincrement=False, nullable=True))
+    op.add_column('chats', sa.Column('total_chunks', sa.INTEGER(), autoincrement=False, nullable=True))
+    op.add_column('chats', sa.Column('indexing_status', sa.VARCHAR(), autoincrement=False, nullable=True))
+    op.add_column('chats', sa.Column('repo_info', sa.VARCHAR(), autoincrement=False, nullable=True))
+    op.execute(
+        """
+        UPDATE chats SET repo_info = r.repo_info, indexing_status = r.indexing_status,
+            total_chunks = r.total_chunks, indexed_chunks = r.indexed_chunks
+        FROM repo_indexes r WHERE chats.repo_id = r.id
+        """
+    )
+    # github_url is unique again, so keep only the oldest chat per repo
+    op.execute(
+        """
+        DELETE FROM chats c USING chats older
+        WHERE c.github_url = older.github_url AND older.created_at < c.created_at
+        """
+    )
+    op.drop_index(op.f('ix_chats_github_url'), table_name='chats')
+    op.create_index('ix_chats_github_url', 'chats', ['github_url'], unique=True)
+    op.drop_constraint('chats_repo_id_fkey', 'chats', type_='foreignkey')
+    op.drop_index(op.f('ix_chats_repo_id'), table_name='chats')
+    op.drop_column('chats', 'repo_id')
+
+    op.drop_index(op.f('ix_repo_indexes_github_url'), table_name='repo_indexes')
+    op.drop_index(op.f('ix_repo_indexes_id'), table_name='repo_indexes')
+    op.drop_table('repo_indexes')
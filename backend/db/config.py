@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from typing import AsyncIterator
 from dotenv import load_dotenv
 import os
 
@@ -10,15 +11,49 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise Exception("DATABASE_URL is not set in the environment variables")
 
-engine = create_engine(str(DATABASE_URL))
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connections kept open, and extra ones allowed under load
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or 10)
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW") or 20)
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or 30)
+# Seconds after which a connection is replaced, below typical proxy idle timeouts
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE") or 1800)
+DB_POOL_PRE_PING = (os.getenv("DB_POOL_PRE_PING") or "true").lower() != "false"
+
+
+def async_database_url(url: str):
+    """DATABASE_URL (as used by alembic with psycopg2) for the asyncpg driver."""
+    parsed = make_url(url)
+    query = dict(parsed.query)
+    # asyncpg takes ssl=<mode> instead of libpq's sslmode=<mode>
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return parsed.set(drivername="postgresql+asyncpg", query=query)
+
+
+def asyncpg_dsn(url: str) -> str:
+    """DATABASE_URL for a plain asyncpg connection outside the pool, e.g. for LISTEN."""
+    # asyncpg understands libpq's sslmode itself
+    return make_url(url).set(drivername="postgresql").render_as_string(
+        hide_password=False
+    )
+
+
+engine = create_async_engine(
+    async_database_url(str(DATABASE_URL)),
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+# Attributes stay loaded after commit, since reloading them lazily isn't possible
+# without an await
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,4 +1,15 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer
+from sqlalchemy import (
+    Column,
+    String,
+    DateTime,
+    ForeignKey,
+    Boolean,
+    Integer,
+    LargeBinary,
+    Index,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from .config import Base
 
@@ -12,25 +23,118 @@ class User(Base):
     name = Column(String)
 
 
-class Chat(Base):
-    __tablename__ = "chats"
+class RepoIndex(Base):
+    """A repository's index, shared by every chat about that repository."""
 
+    __tablename__ = "repo_indexes"
+
+    # The repo's Pinecone namespace, see db/pinecone.py
     id = Column(String, primary_key=True, index=True)
     github_url = Column(String, unique=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"))
     repo_info = Column(String)
     indexing_status = Column(String, default="not_started")
     total_chunks = Column(Integer, default=0)
     indexed_chunks = Column(Integer, default=0)
+    # Bumped whenever a re-index changes the indexed content
+    content_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Compact summary used in prompts instead of repo_info, see api/profile.py
+    profile = Column(JSONB)
+    # Commit the profile was computed from
+    profile_commit = Column(String)
+
+
+class Chat(Base):
+    __tablename__ = "chats"
+
+    id = Column(String, primary_key=True, index=True)
+    github_url = Column(String, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"))
+    # Chats referencing a repo keep it alive, see api/repos.py
+    repo_id = Column(String, ForeignKey("repo_indexes.id"), index=True)
     is_bookmarked = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # Recents, newest first with id as the keyset tie-breaker, see api/pagination.py
+        Index("ix_chats_user_id_created_at", "user_id", "created_at", "id"),
+    )
+
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
     id = Column(String, primary_key=True, index=True)
-    chat_id = Column(String, ForeignKey("chats.id", ondelete="CASCADE"), index=True)
+    chat_id = Column(String, ForeignKey("chats.id", ondelete="CASCADE"))
     message = Column(String)
     role = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Also serves lookups by chat_id alone, e.g. the cascade from chats
+        Index("ix_chat_messages_chat_id_created_at", "chat_id", "created_at", "id"),
+    )
+
+
+class CachedEmbedding(Base):
+    __tablename__ = "embedding_cache"
+
+    content_hash = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    # float32 array, see api/embedding_cache.py
+    embedding = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class RepoFile(Base):
+    """Content hash and chunk count of every indexed file, used for incremental re-indexing."""
+
+    __tablename__ = "repo_files"
+
+    namespace = Column(String, primary_key=True)
+    path = Column(String, primary_key=True)
+    content_hash = Column(String, nullable=False)
+    chunk_count = Column(Integer, nullable=False)
+
+
+class RepoChunk(Base):
+    """Text of every indexed chunk, kept alongside its vector for lexical search."""
+
+    __tablename__ = "repo_chunks"
+
+    namespace = Column(String, primary_key=True)
+    # The chunk's vector id in Pinecone
+    id = Column(String, primary_key=True)
+    file_path = Column(String, nullable=False)
+    content = Column(String, nullable=False)
+    symbols = Column(JSONB, nullable=False, server_default="[]")
+    start_line = Column(Integer)
+    end_line = Column(Integer)
+
+
+class IndexingJob(Base):
+    __tablename__ = "indexing_jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    repo_id = Column(
+        String, ForeignKey("repo_indexes.id", ondelete="CASCADE"), nullable=False
+    )
+    # queued -> running -> completed | failed, back to queued while retries remain
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime(timezone=True), server_default=func.now())
+    heartbeat_at = Column(DateTime(timezone=True))
+    # Hash of the files being indexed, a retry only resumes if it still matches
+    fingerprint = Column(String)
+    last_error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # At most one queued or running job per repo
+        Index(
+            "ix_indexing_jobs_active_repo_id",
+            "repo_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
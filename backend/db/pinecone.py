@@ -1,5 +1,6 @@
 from pinecone import Pinecone, ServerlessSpec
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,3 +25,9 @@ def init_index():
 def get_index():
     init_index()
     return pc.Index("reactchat")
+
+
+def get_namespace(github_url: str) -> str:
+    # One namespace per repository, e.g. "https://github.com/vercel/next.js" -> "vercel/next.js"
+    repo_path = re.sub(r"^(?:https://)?github\.com/", "", github_url.rstrip("/"))
+    return re.sub(r"[^a-zA-Z0-9._/-]", "_", repo_path)
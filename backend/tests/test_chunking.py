@@ -0,0 +1,66 @@
+from api.chunking import _brace_depths, split_file
+
+
+def symbols(file_path: str, content: str):
+    return [chunk.symbols for chunk in split_file(file_path, content)]
+
+
+def test_regex_literal_brackets_are_skipped():
+    lines = [
+        "const re = /[{]/;",
+        "const other = /\\}+/g.test(x);",
+        "export function after() {",
+        "  return a / b / c;",
+        "}",
+    ]
+
+    assert _brace_depths(lines) == [0, 0, 0, 1, 1, 0]
+
+
+def test_declarations_after_a_regex_literal_keep_their_symbols():
+    content = "\n".join(
+        [
+            "const re = /[{]/;",
+            "",
+            "export function after() {",
+            "  return re.test('x');",
+            "}",
+            "",
+            "export const last = 1;",
+        ]
+    )
+
+    assert symbols("src/re.ts", content) == [["re", "after", "last"]]
+
+
+def test_division_is_not_a_regex():
+    lines = ["const half = total / 2; const config = { third: (total) / 3,", "};"]
+
+    assert _brace_depths(lines) == [0, 1, 0]
+
+
+def test_unbalanced_brackets_fall_back_to_windows():
+    content = "\n".join(["export function broken() {", "  return 1;", "export const x = 2;"])
+
+    chunks = list(split_file("src/broken.ts", content))
+
+    assert [chunk.content for chunk in chunks] == [content]
+    assert chunks[0].symbols == []
+
+
+def test_multi_line_selector_lists_are_kept_whole():
+    content = "\n".join(
+        [
+            "@import 'base.css';",
+            "",
+            "h1,",
+            "h2,",
+            ".title {",
+            "  margin: 0;",
+            "}",
+            "",
+            ".body { padding: 0; }",
+        ]
+    )
+
+    assert symbols("styles/app.css", content) == [["h1, h2, .title", ".body"]]
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from api.github import GitHubClient, RateLimitedError, retry_after_seconds
+
+
+def http_date(delta: timedelta) -> str:
+    return format_datetime(datetime.now(timezone.utc) + delta, usegmt=True)
+
+
+def client_for(responses):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses[min(len(requests), len(responses)) - 1]
+
+    client = GitHubClient(
+        api_url="https://api.test",
+        backoff_base=0,
+        transport=httpx.MockTransport(handler),
+    )
+    return client, requests
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("3") == 3.0
+    assert retry_after_seconds(http_date(timedelta(days=-1))) == 0.0
+    assert 55 < retry_after_seconds(http_date(timedelta(seconds=60))) <= 60
+    assert retry_after_seconds("soon") is None
+
+
+def test_http_date_retry_after_is_retried():
+    client, requests = client_for(
+        [
+            httpx.Response(503, headers={"Retry-After": http_date(timedelta(0))}),
+            httpx.Response(200, json={"ok": True}),
+        ]
+    )
+
+    status, body = asyncio.run(client.get("/repos/owner/repo"))
+
+    assert (status, body) == (200, {"ok": True})
+    assert len(requests) == 2
+
+
+def test_distant_http_date_retry_after_is_rate_limited():
+    client, _ = client_for(
+        [httpx.Response(429, headers={"Retry-After": http_date(timedelta(hours=1))})]
+    )
+
+    with pytest.raises(RateLimitedError):
+        asyncio.run(client.get("/repos/owner/repo"))
+
+
+def test_unparseable_retry_after_falls_back_to_backoff():
+    client, requests = client_for(
+        [
+            httpx.Response(503, headers={"Retry-After": "soon"}),
+            httpx.Response(200, json={"ok": True}),
+        ]
+    )
+
+    status, _ = asyncio.run(client.get("/repos/owner/repo"))
+
+    assert status == 200
+    assert len(requests) == 2
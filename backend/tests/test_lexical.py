@@ -0,0 +1,46 @@
+from api.lexical import LexicalDoc, LexicalIndex
+
+
+def make_index() -> LexicalIndex:
+    return LexicalIndex(
+        [
+            LexicalDoc(
+                id="readme#0",
+                file_path="README.md",
+                content="# Project\n\nA small app.\n\n## Setup\n\nRun bun install.",
+                symbols=["Project", "Setup"],
+            ),
+            LexicalDoc(
+                id="auth#0",
+                file_path="src/hooks/useAuth.ts",
+                content="export function useAuth() {\n  return useContext(AuthContext);\n}",
+                symbols=["useAuth"],
+            ),
+            LexicalDoc(
+                id="navbar#0",
+                file_path="src/components/Navbar.tsx",
+                content="export default function Navbar() {\n  return <nav />;\n}",
+                symbols=["Navbar"],
+            ),
+        ]
+    )
+
+
+def test_markdown_headings_are_not_identifiers():
+    index = make_index()
+
+    assert index.identifiers("Tell me about Project") == []
+    assert index.identifiers("How do I Setup this?") == []
+
+
+def test_code_symbols_and_file_names_are_identifiers():
+    index = make_index()
+
+    assert index.identifiers("what does useAuth do?") == ["useAuth"]
+    assert index.identifiers("Where is Navbar rendered?") == ["Navbar"]
+
+
+def test_markdown_headings_still_rank_in_bm25():
+    index = make_index()
+
+    assert index.search("project setup", 1)[0]["id"] == "readme#0"
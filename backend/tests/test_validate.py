@@ -0,0 +1,78 @@
+import json
+
+from api.routes.ingest import MAX_REPO_TOKENS, exceeds_token_limit
+from tests.conftest import load_snapshot
+
+APP = """import { useState } from "react";
+
+export default function App() {
+  const [count, setCount] = useState(0);
+  return <button onClick={() => setCount(count + 1)}>{count}</button>;
+}
+"""
+
+
+def package_lock(packages: int) -> str:
+    return json.dumps(
+        {
+            "name": "app",
+            "lockfileVersion": 3,
+            "packages": {
+                f"node_modules/package-{i}": {
+                    "version": f"1.0.{i}",
+                    "resolved": f"https://registry.npmjs.org/package-{i}/-/package-{i}-1.0.{i}.tgz",
+                    "integrity": f"sha512-{'a' * 86}{i:02d}==",
+                }
+                for i in range(packages)
+            },
+        },
+        indent=2,
+    )
+
+
+def test_large_lock_file_is_left_out_of_the_snapshot(snapshot_dir, tmp_path):
+    snapshot = load_snapshot(
+        tmp_path,
+        {
+            "package.json": '{"name": "app"}',
+            "package-lock.json": package_lock(10_000),
+            "yarn.lock": "# yarn lockfile v1\n",
+            ".gitignore": "node_modules\n",
+            "src/App.tsx": APP,
+        },
+    )
+
+    assert [file.path for file in snapshot.files] == ["package.json", "src/App.tsx"]
+    assert "package-lock.json" not in snapshot.tree()
+
+
+def test_repo_with_large_lock_file_passes_validation(snapshot_dir, tmp_path):
+    lock = package_lock(10_000)
+    assert len(lock) > MAX_REPO_TOKENS * 10
+
+    snapshot = load_snapshot(
+        tmp_path,
+        {"package.json": '{"name": "app"}', "package-lock.json": lock, "src/App.tsx": APP},
+    )
+
+    assert not exceeds_token_limit(snapshot, MAX_REPO_TOKENS)
+
+
+def test_skipped_files_dont_count_toward_the_limit(snapshot_dir, tmp_path):
+    # Past the byte bound on its own, but never indexed
+    tsconfig = package_lock(10_000)
+
+    snapshot = load_snapshot(
+        tmp_path, {"tsconfig.json": tsconfig, "src/App.tsx": APP}
+    )
+
+    assert not exceeds_token_limit(snapshot, MAX_REPO_TOKENS)
+
+
+def test_repo_over_the_limit_fails_validation(snapshot_dir, tmp_path):
+    # Past the byte bound, so it's rejected without tokenizing
+    snapshot = load_snapshot(
+        tmp_path, {"src/App.tsx": APP * (MAX_REPO_TOKENS * 10 // len(APP) + 1)}
+    )
+
+    assert exceeds_token_limit(snapshot, MAX_REPO_TOKENS)
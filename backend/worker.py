@@ -0,0 +1,9 @@
+import asyncio
+import logging
+import os
+
+from api.jobs import run_worker
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker(int(os.getenv("INDEXING_CONCURRENCY") or 2)))
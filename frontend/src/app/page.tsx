@@ -13,7 +13,7 @@ export default async function HomePage() {
   let chats: RecentChat[] = [];
 
   if (userId) {
-    const response = await serverFetch(`${BACKEND_URL}/chat/recents`, {
+    const response = await serverFetch(`${BACKEND_URL}/chat/recents?limit=6`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
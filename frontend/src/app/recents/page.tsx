@@ -3,12 +3,13 @@ import { redirect } from "next/navigation";
 import PageWrapper from "~/components/page-wrapper";
 import { Recents } from "~/components/recents";
 import { serverFetch } from "~/lib/server-fetch";
-import type { RecentChat } from "~/lib/types";
+import type { RecentChat, RecentChatsPage } from "~/lib/types";
 
 export default async function RecentsPage() {
   const { userId } = await auth();
 
   let chats: RecentChat[] = [];
+  let nextCursor: string | null = null;
   const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL;
 
   if (userId) {
@@ -20,8 +21,9 @@ export default async function RecentsPage() {
     });
 
     if (response.ok) {
-      const data = (await response.json()) as { chats: RecentChat[] };
+      const data = (await response.json()) as RecentChatsPage;
       chats = data.chats;
+      nextCursor = data.next_cursor;
     }
   } else {
     redirect("/");
@@ -29,7 +31,7 @@ export default async function RecentsPage() {
 
   return (
     <PageWrapper className="items-center">
-      <Recents recentChats={chats} userId={userId} />
+      <Recents recentChats={chats} nextCursor={nextCursor} userId={userId} />
     </PageWrapper>
   );
 }
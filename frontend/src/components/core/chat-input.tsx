@@ -86,6 +86,8 @@ export default function ChatInput({
             message: input,
             model,
             selected_context: selectedContext,
+            // Deltas instead of the full answer on every token
+            stream_version: 2,
           }),
         },
       );
@@ -98,29 +100,48 @@ export default function ChatInput({
         throw new Error("Failed to get reader");
       }
 
+      const decoder = new TextDecoder();
+      let buffer = "";
       let assistantMessageContent = "";
 
       while (true) {
         const { value, done } = await reader.read();
         if (done) break;
 
-        const chunk = new TextDecoder().decode(value);
-        const lines = chunk.split("\n\n");
-
-        for (const line of lines) {
-          if (line.startsWith("data:")) {
-            const jsonStr = line.substring(5);
-            try {
-              const payload = JSON.parse(jsonStr) as { content: string };
+        // Events can be split across reads, so only parse complete ones
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+
+        for (const event of events) {
+          let type = "message";
+          let data = "";
+          for (const line of event.split("\n")) {
+            if (line.startsWith("event:")) {
+              type = line.substring(6).trim();
+            } else if (line.startsWith("data:")) {
+              data += line.substring(5);
+            }
+          }
+          if (!data) continue;
+
+          try {
+            if (type === "delta") {
+              const payload = JSON.parse(data) as { delta: string };
+              assistantMessageContent += payload.delta;
+            } else if (type === "checkpoint") {
+              const payload = JSON.parse(data) as { content: string };
               assistantMessageContent = payload.content;
-              onNewMessage({
-                id: assistantMessageId,
-                content: assistantMessageContent,
-                role: "assistant",
-              });
-            } catch (e) {
-              console.error("Error parsing JSON chunk:", e, jsonStr);
+            } else {
+              continue;
             }
+            onNewMessage({
+              id: assistantMessageId,
+              content: assistantMessageContent,
+              role: "assistant",
+            });
+          } catch (e) {
+            console.error("Error parsing JSON chunk:", e, data);
           }
         }
       }
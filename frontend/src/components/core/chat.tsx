@@ -15,6 +15,7 @@ import Link from "next/link";
 import { useIsMobile } from "~/hooks/useIsMobile";
 import { useClientFetch } from "~/lib/client-fetch";
 import { BACKEND_URL } from "~/constants";
+import { Button } from "~/components/ui/button";
 
 export type Message = {
   id?: string;
@@ -22,6 +23,11 @@ export type Message = {
   role: "user" | "assistant";
 };
 
+type MessagesPage = {
+  messages: Message[];
+  next_cursor: string | null;
+};
+
 export default function Chat({
   userInfo,
   selectedContext,
@@ -41,6 +47,9 @@ export default function Chat({
 }) {
   const [model, setModel] = useState<string>("gpt-4o");
   const [messages, setMessages] = useState<Message[]>([]);
+  // Older messages are fetched on demand, newest page first
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [isStreaming, setIsStreaming] = useState(false);
   const params = useParams<{ id: string }>();
@@ -57,8 +66,9 @@ export default function Chat({
       );
 
       if (response.ok) {
-        const data = (await response.json()) as { messages: Message[] };
+        const data = (await response.json()) as MessagesPage;
         setMessages(data.messages);
+        setCursor(data.next_cursor);
         setTimeout(() => {
           const scrollContainer = scrollAreaRef.current?.querySelector(
             "[data-radix-scroll-area-viewport]",
@@ -82,6 +92,34 @@ export default function Chat({
     void fetchMessages();
   }, [chatId, BACKEND_URL, clientFetch]);
 
+  const loadOlderMessages = async () => {
+    if (!cursor) return;
+    setIsLoadingOlder(true);
+    try {
+      const response = await clientFetch(
+        `${BACKEND_URL}/chat/${chatId}/fetch/messages?cursor=${encodeURIComponent(cursor)}`,
+      );
+      if (!response.ok) return;
+      const data = (await response.json()) as MessagesPage;
+
+      // Keep the messages in view where they were once older ones are prepended
+      const scrollContainer = scrollAreaRef.current?.querySelector(
+        "[data-radix-scroll-area-viewport]",
+      );
+      const previousHeight = scrollContainer?.scrollHeight ?? 0;
+      setMessages((prevMessages) => [...data.messages, ...prevMessages]);
+      setCursor(data.next_cursor);
+      requestAnimationFrame(() => {
+        if (scrollContainer) {
+          scrollContainer.scrollTop +=
+            scrollContainer.scrollHeight - previousHeight;
+        }
+      });
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
   const handleNewMessage = useCallback((message: Message) => {
     setMessages((prevMessages) => {
       if (message.id) {
@@ -139,6 +177,18 @@ export default function Chat({
             </div>
           )}
           <ScrollArea className="flex-1" ref={scrollAreaRef}>
+            {cursor && (
+              <div className="flex justify-center pt-4">
+                <Button
+                  variant="ghost"
+                  size="sm"
+                  onClick={() => void loadOlderMessages()}
+                  disabled={isLoadingOlder}
+                >
+                  {isLoadingOlder ? "Loading..." : "Load earlier messages"}
+                </Button>
+              </div>
+            )}
             <Messages messages={messages} isStreaming={isStreaming} />
           </ScrollArea>
           <ChatInput
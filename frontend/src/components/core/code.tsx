@@ -10,7 +10,9 @@ import { useEffect, useState, useRef } from "react";
 import { useTheme } from "next-themes";
 import { Editor as MonacoEditor, type Monaco } from "@monaco-editor/react";
 import { FaReact, FaChevronRight } from "react-icons/fa";
-import { getRepo } from "~/lib/db";
+import { getFile, getRepo, setFile } from "~/lib/db";
+import { useClientFetch } from "~/lib/client-fetch";
+import { BACKEND_URL } from "~/constants";
 import { Skeleton } from "../ui/skeleton";
 import { useClerk } from "@clerk/nextjs";
 import Link from "next/link";
@@ -46,6 +48,7 @@ export default function Code({
   const { theme } = useTheme();
   const isDarkMode = theme === "dark";
   const clerk = useClerk();
+  const clientFetch = useClientFetch();
 
   const beforeMount = (monaco: Monaco) => {
     monaco.editor.defineTheme("custom-dark", {
@@ -161,7 +164,24 @@ export default function Code({
           return;
         }
 
-        setCode(fileData.content);
+        // Contents are cached by hash, so unchanged files are shared across commits
+        let content = await getFile(fileData.sha);
+        if (content === undefined) {
+          const query = new URLSearchParams({
+            path: fileData.path,
+            ref: repo.commit_sha,
+          });
+          const response = await clientFetch(
+            `${BACKEND_URL}/repo/${params.id}/file?${query.toString()}`,
+          );
+          if (!response.ok) {
+            throw new Error("Failed to fetch file");
+          }
+          content = await response.text();
+          await setFile(fileData.sha, content);
+        }
+
+        setCode(content);
 
         const extension = file.split(".").pop()?.toLowerCase();
         switch (extension) {
@@ -199,7 +219,7 @@ export default function Code({
     }
 
     void loadCode();
-  }, [file, params.id]);
+  }, [file, params.id, clientFetch]);
 
   useEffect(() => {
     const checkOverflow = () => {
@@ -2,7 +2,7 @@
 
 import { useParams, useSearchParams } from "next/navigation";
 import { useEffect, useState } from "react";
-import { getRepo, setRepo } from "~/lib/db";
+import { getRepo, setRepo, type RepoFileInfo } from "~/lib/db";
 import type { FileNode } from "~/lib/types";
 import FileTreeItem from "./file-tree-item";
 import { Skeleton } from "~/components/ui/skeleton";
@@ -38,9 +38,11 @@ export default function FileTree() {
           `${BACKEND_URL}/repo/${decodeURIComponent(params.id)}`,
         );
 
+        // Only the tree; file contents are fetched when a file is opened
         const data = (await response.json()) as {
-          files: { path: string; content: string }[];
+          files: RepoFileInfo[];
           github_url: string;
+          commit_sha: string;
         };
 
         await setRepo(params.id, data);
@@ -55,10 +57,10 @@ export default function FileTree() {
     void loadRepo();
   }, [params.id, BACKEND_URL, clientFetch]);
 
-  function buildTree(files: { path: string; content: string }[]) {
+  function buildTree(files: RepoFileInfo[]) {
     const root: FileNode[] = [];
 
-    files.forEach(({ path, content }) => {
+    files.forEach(({ path }) => {
       const parts = path.split("/");
       let currentLevel = root;
 
@@ -75,7 +77,7 @@ export default function FileTree() {
             name: part,
             path,
             type: isFile ? "file" : "directory",
-            ...(isFile ? { content } : { children: [] }),
+            ...(isFile ? {} : { children: [] }),
           };
 
           currentLevel.push(newNode);
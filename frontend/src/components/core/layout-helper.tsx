@@ -5,13 +5,13 @@ import type { ChatStatus, IngestStatus } from "~/lib/types";
 import Chat from "./chat";
 import Code from "./code";
 import FileTree from "./file-tree";
-import { useEffect, useState, useCallback, useRef } from "react";
+import { useEffect, useState, useCallback } from "react";
 import { useParams } from "next/navigation";
 import { Progress } from "~/components/ui/progress";
 import { useClientFetch } from "~/lib/client-fetch";
 import { BACKEND_URL } from "~/constants";
 
-const POLL_INTERVAL = 1000; // poll every second
+const RECONNECT_DELAY = 1000; // wait a second before resuming a dropped stream
 
 export type SelectedContext = Record<string, string[]>; // { file_path: [code_snippet] }
 
@@ -31,7 +31,6 @@ export default function LayoutHelper({
   const [chatStatus, setChatStatus] = useState<ChatStatus>(initialChatStatus);
   const params = useParams<{ id: string }>();
   const chatId = params.id;
-  const pollingRef = useRef<NodeJS.Timeout>(undefined);
   const [showFileTreeAndCode, setShowFileTreeAndCode] = useState(true);
   const [isLoading, setIsLoading] = useState(true);
   const clientFetch = useClientFetch();
@@ -46,74 +45,108 @@ export default function LayoutHelper({
     setIsLoading(false);
   }, [chatId]);
 
-  const pollIndexingStatus = useCallback(async () => {
-    try {
-      const response = await clientFetch(
-        `${BACKEND_URL}/ingest/${chatId}/status`,
-      );
-      const data = (await response.json()) as {
-        status: IngestStatus;
-        progress: number;
-      };
-      setIndexingStatus(data.status);
-
-      if (data.progress !== undefined) {
-        setProgress(data.progress);
-      }
+  const streamIndexingStatus = useCallback(
+    async (signal: AbortSignal) => {
+      let lastEventId: string | undefined;
 
-      if (data.status === "in_progress") {
-        pollingRef.current = setTimeout(
-          () => void pollIndexingStatus(),
-          POLL_INTERVAL,
-        );
-      }
-    } catch (error) {
-      console.log(error);
-      setIndexingStatus("failed");
-    }
-  }, [BACKEND_URL, chatId, clientFetch]);
-
-  useEffect(() => {
-    if (indexingStatus === "not_started") {
-      const startIndexing = async () => {
+      while (!signal.aborted) {
         try {
-          setIndexingStatus("in_progress");
           const response = await clientFetch(
-            `${BACKEND_URL}/ingest/${chatId}`,
+            `${BACKEND_URL}/ingest/${chatId}/events`,
             {
-              method: "POST",
-              headers: {
-                "Content-Type": "application/json",
-              },
+              headers: lastEventId ? { "Last-Event-ID": lastEventId } : {},
+              signal,
             },
           );
+          if (!response.ok || !response.body) {
+            throw new Error("Failed to stream indexing status");
+          }
+
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = "";
+
+          while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split("\n\n");
+            buffer = events.pop() ?? "";
 
-          const data = (await response.json()) as { status: IngestStatus };
+            for (const event of events) {
+              let data = "";
+              for (const line of event.split("\n")) {
+                if (line.startsWith("id:")) {
+                  lastEventId = line.substring(3).trim();
+                } else if (line.startsWith("data:")) {
+                  data += line.substring(5);
+                }
+              }
+              if (!data) continue;
 
-          if (data.status === "completed") {
-            setIndexingStatus("completed");
-            window.location.reload();
-          } else if (data.status === "in_progress") {
-            setIndexingStatus("in_progress");
-            void pollIndexingStatus();
+              const payload = JSON.parse(data) as {
+                status: IngestStatus;
+                progress: number;
+              };
+              setIndexingStatus(payload.status);
+              setProgress(payload.progress);
+
+              if (payload.status !== "in_progress") {
+                return;
+              }
+            }
           }
         } catch (error) {
+          if (signal.aborted) return;
           console.log(error);
-          setIndexingStatus("failed");
         }
-      };
 
-      void startIndexing();
-    } else if (indexingStatus === "in_progress") {
-      void pollIndexingStatus();
-    }
+        // Stream dropped before indexing finished, resume from the last event
+        await new Promise((resolve) => setTimeout(resolve, RECONNECT_DELAY));
+      }
+    },
+    [BACKEND_URL, chatId, clientFetch],
+  );
 
-    return () => {
-      if (pollingRef.current) {
-        clearTimeout(pollingRef.current);
+  useEffect(() => {
+    const controller = new AbortController();
+
+    const startIndexing = async () => {
+      if (initialStatus === "not_started") {
+        setIndexingStatus("in_progress");
+        const response = await clientFetch(`${BACKEND_URL}/ingest/${chatId}`, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          signal: controller.signal,
+        });
+
+        const data = (await response.json()) as { status: IngestStatus };
+
+        if (data.status === "completed") {
+          setIndexingStatus("completed");
+          window.location.reload();
+          return;
+        }
+      } else if (initialStatus !== "in_progress") {
+        return;
       }
+
+      await streamIndexingStatus(controller.signal);
+    };
+
+    startIndexing().catch((error) => {
+      if (controller.signal.aborted) return;
+      console.log(error);
+      setIndexingStatus("failed");
+    });
+
+    return () => {
+      controller.abort();
     };
-  }, [indexingStatus, BACKEND_URL, chatId, pollIndexingStatus, clientFetch]);
+  }, [initialStatus, BACKEND_URL, chatId, streamIndexingStatus, clientFetch]);
 
   if (isLoading) {
     return null;
@@ -1,7 +1,7 @@
 "use client";
 
 import Link from "next/link";
-import type { RecentChat } from "~/lib/types";
+import type { RecentChat, RecentChatsPage } from "~/lib/types";
 import { PiClockCounterClockwiseBold } from "react-icons/pi";
 import { FaChevronRight, FaGithub } from "react-icons/fa";
 import { formatDistanceToNow } from "date-fns";
@@ -19,12 +19,16 @@ import {
   TooltipContent,
   TooltipTrigger,
 } from "~/components/ui/tooltip";
+import { useClientFetch } from "~/lib/client-fetch";
+import { BACKEND_URL } from "~/constants";
 
 export function Recents({
   recentChats,
+  nextCursor = null,
   userId,
 }: {
   recentChats: RecentChat[];
+  nextCursor?: string | null;
   userId: string | null;
 }) {
   const pathname = usePathname();
@@ -33,6 +37,27 @@ export function Recents({
   const [chats, setChats] = useState<RecentChat[]>(recentChats);
   const [bookmarkedChats, setBookmarkedChats] = useState<RecentChat[]>([]);
   const [showBookmarked, setShowBookmarked] = useState(false);
+  const [cursor, setCursor] = useState<string | null>(nextCursor);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const clientFetch = useClientFetch();
+
+  const loadMore = async () => {
+    if (!cursor) return;
+    setIsLoadingMore(true);
+    try {
+      const response = await clientFetch(
+        `${BACKEND_URL}/chat/recents?cursor=${encodeURIComponent(cursor)}`,
+        { method: "POST" },
+      );
+      if (response.ok) {
+        const data = (await response.json()) as RecentChatsPage;
+        setChats((prevChats) => [...prevChats, ...data.chats]);
+        setCursor(data.next_cursor);
+      }
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
   useEffect(() => {
     setBookmarkedChats(chats.filter((chat) => chat.is_bookmarked));
@@ -51,7 +76,9 @@ export function Recents({
                   ? `(${bookmarkedChats.length} chat${
                       bookmarkedChats.length === 1 ? "" : "s"
                     })`
-                  : `(${chats.length} chat${chats.length === 1 ? "" : "s"})`}
+                  : `(${chats.length}${cursor ? "+" : ""} chat${
+                      chats.length === 1 && !cursor ? "" : "s"
+                    })`}
               </span>
             )}
           </h2>
@@ -113,6 +140,17 @@ export function Recents({
               setChats={setChats}
             />
           )}
+          {cursor && (
+            <div className="mt-6 flex justify-center">
+              <Button
+                variant="ghost"
+                onClick={() => void loadMore()}
+                disabled={isLoadingMore}
+              >
+                {isLoadingMore ? "Loading..." : "Load more"}
+              </Button>
+            </div>
+          )}
         </div>
       ) : (
         <div className="grid grid-cols-1 gap-3 md:grid-cols-2 lg:grid-cols-3">
@@ -158,7 +196,6 @@ function ChatCard({
     <div className="flex flex-col gap-5">
       {chats
         .filter((chat) => chat.github_url.includes(search.toLowerCase()))
-        .slice(0, 6)
         .map((chat) => (
           <Link
             key={chat.id}
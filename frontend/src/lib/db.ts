@@ -1,22 +1,39 @@
 import { openDB, type DBSchema } from "idb";
 
+export interface RepoFileInfo {
+  path: string;
+  size: number;
+  sha: string;
+}
+
 interface RepoSchema extends DBSchema {
   repos: {
     key: string; // chatId
     value: {
-      files: { path: string; content: string }[];
+      files: RepoFileInfo[];
       github_url: string;
+      commit_sha: string;
     };
   };
+  files: {
+    key: string; // content sha, shared by every repo and commit
+    value: string;
+  };
 }
 
 const DB_NAME = "reactchat";
 const STORE_NAME = "repos";
+const FILES_STORE_NAME = "files";
 
 async function initDB() {
-  return openDB<RepoSchema>(DB_NAME, 1, {
-    upgrade(db) {
+  return openDB<RepoSchema>(DB_NAME, 2, {
+    upgrade(db, oldVersion) {
+      // Version 1 cached every file's content inline with the tree
+      if (oldVersion >= 1) {
+        db.deleteObjectStore(STORE_NAME);
+      }
       db.createObjectStore(STORE_NAME);
+      db.createObjectStore(FILES_STORE_NAME);
     },
   });
 }
@@ -42,3 +59,13 @@ export async function deleteRepo(chatId: string) {
     await db.delete(STORE_NAME, chatId);
   }
 }
+
+export async function getFile(sha: string) {
+  const db = await initDB();
+  return db.get(FILES_STORE_NAME, sha);
+}
+
+export async function setFile(sha: string, content: string) {
+  const db = await initDB();
+  return db.put(FILES_STORE_NAME, content, sha);
+}
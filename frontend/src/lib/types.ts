@@ -10,7 +10,6 @@ export interface FileNode {
   path: string;
   type: "file" | "directory";
   children?: FileNode[];
-  content?: string;
 }
 
 export interface RecentChat {
@@ -20,6 +19,11 @@ export interface RecentChat {
   is_bookmarked: boolean;
 }
 
+export interface RecentChatsPage {
+  chats: RecentChat[];
+  next_cursor: string | null;
+}
+
 export type IngestStatus =
   | "not_started"
   | "in_progress"